@@ -0,0 +1,237 @@
+""" Rolling-window goal analytics over the daily totals.
+
+``GoalAnalytics`` walks the calendar one day at a time and keeps, after
+each step:
+
+- 7/30/90-day moving averages of every macro (over the days logged in the
+  window), as running window sums;
+- the streak of consecutive logged days at or under the calorie limit;
+- per-macro adherence: the share of logged days meeting each goal;
+- weekday patterns: average intake per day of the week.
+
+Every step is O(1), and so is undoing one, so adding food for the latest
+day only redoes that day. Changing an older day replays the days after it.
+"""
+from records import MACROS, day_number, day_string, weekday
+
+WINDOWS = (7, 30, 90)
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# How each goal is met: calories is a ceiling, protein a floor, fat and carbs a target band
+GOAL_KINDS = {"calories": "max", "protein": "min", "fat": "band", "carbs": "band"}
+
+# Half-width of a target band, as a fraction of the goal
+TOLERANCE = 0.10
+
+
+def meets(macro, value, goal):
+    """ Whether a day's total for macro meets its goal """
+    kind = GOAL_KINDS[macro]
+    if kind == "max":
+        return value <= goal
+    if kind == "min":
+        return value >= goal
+    return abs(value - goal) <= TOLERANCE * goal
+
+
+class GoalAnalytics:
+    """ Moving averages, streaks, adherence and weekday patterns, updated a day at a time.
+
+    ``goals`` maps each macro to its daily goal, or is a GoalsProfile, in
+    which case each day is scored against the version in force on that day
+    (one binary search per step). Days are fed in with
+    ``set_day`` (a day's new totals) or ``add`` (one more food record);
+    ``from_rollups`` replays a RollupCache's Daily table.
+    """
+
+    def __init__(self, goals, windows=WINDOWS):
+        self.goals = goals if hasattr(goals, "for_day") else dict(goals)
+        self.windows = tuple(windows)
+        self.first = None
+        self.values = {macro: [] for macro in MACROS}
+        self.logged = []
+        self.averages = {window: {macro: [] for macro in MACROS} for window in self.windows}
+        self.streaks = []
+        self._sums = {window: dict.fromkeys(MACROS, 0.0) for window in self.windows}
+        self._counts = dict.fromkeys(self.windows, 0)
+        self._hits = dict.fromkeys(MACROS, 0)
+        self._logged_days = 0
+        self._weekday_sums = [dict.fromkeys(MACROS, 0.0) for _ in WEEKDAYS]
+        self._weekday_counts = [0] * len(WEEKDAYS)
+        self._best = None
+
+    @classmethod
+    def from_rollups(cls, daily, goals, windows=WINDOWS):
+        """ Build from a Daily rollup table ({date: [calories, protein, fat, carbs]}) """
+        analytics = cls(goals, windows)
+        for food_date in sorted(daily):
+            analytics.set_day(food_date, daily[food_date])
+        return analytics
+
+    def __len__(self):
+        return len(self.logged)
+
+    def set_day(self, food_date, totals):
+        """ Set the macro totals of one day (a dict, or values in MACROS order) """
+        if isinstance(totals, dict):
+            totals = [totals.get(macro, 0) for macro in MACROS]
+        totals = [float(value) for value in totals]
+        day = day_number(food_date)
+        if self.first is None:
+            self.first = day
+        if day < self.first:
+            # A day before the first one shifts every index; rebuild from scratch
+            days = self._days()
+            days[day] = totals
+            self._reset(day)
+            self._replay(days)
+            return
+        i = day - self.first
+        if i >= len(self.logged):
+            # Unlogged days in between still move the windows and break the streak
+            while len(self.logged) < i:
+                self._step([0.0] * len(MACROS), False)
+            self._step(totals, True)
+            return
+        tail = [([self.values[macro][j] for macro in MACROS], self.logged[j]) for j in range(i + 1, len(self.logged))]
+        while len(self.logged) > i:
+            self._pop()
+        self._step(totals, True)
+        for values, logged in tail:
+            self._step(values, logged)
+
+    def add(self, food):
+        """ Fold one food record into its day """
+        day = day_number(food["date"])
+        i = day - self.first if self.first is not None else -1
+        current = [0.0] * len(MACROS)
+        if 0 <= i < len(self.logged) and self.logged[i]:
+            current = [self.values[macro][i] for macro in MACROS]
+        self.set_day(food["date"], [value + float(food.get(macro, 0) or 0) for value, macro in zip(current, MACROS)])
+
+    def set_goals(self, goals):
+        """ Switch to new goals, re-scoring every day """
+        self.goals = goals if hasattr(goals, "for_day") else dict(goals)
+        days = self._days()
+        self._reset(self.first)
+        self._replay(days)
+
+    def moving_averages(self, macro="calories"):
+        """ {window: latest moving average} of a macro, None where no day in the window was logged """
+        return {window: self.averages[window][macro][-1] if self.logged else None for window in self.windows}
+
+    def series(self, window, macro="calories", days=None):
+        """ (dates, averages) of a window's moving average, optionally only the last ``days`` days """
+        values = self.averages[window][macro]
+        start = 0 if days is None else max(0, len(values) - days)
+        return [day_string(self.first + i) for i in range(start, len(values))], values[start:]
+
+    def current_streak(self):
+        return self.streaks[-1] if self.streaks else 0
+
+    def best_streak(self):
+        if self._best is None:
+            self._best = max(self.streaks, default=0)
+        return self._best
+
+    def adherence(self):
+        """ {macro: percentage of logged days meeting its goal} """
+        if not self._logged_days:
+            return dict.fromkeys(MACROS, 0.0)
+        return {macro: 100.0 * self._hits[macro] / self._logged_days for macro in MACROS}
+
+    def weekday_averages(self):
+        """ {weekday: {macro: average on logged days}} """
+        return {
+            name: {macro: (sums[macro] / count if count else 0.0) for macro in MACROS}
+            for name, sums, count in zip(WEEKDAYS, self._weekday_sums, self._weekday_counts)
+        }
+
+    def summary(self):
+        return {
+            "last_day": day_string(self.first + len(self.logged) - 1) if self.logged else None,
+            "moving_averages": {macro: self.moving_averages(macro) for macro in MACROS},
+            "current_streak": self.current_streak(),
+            "best_streak": self.best_streak(),
+            "adherence": self.adherence(),
+            "weekdays": self.weekday_averages(),
+        }
+
+    def _step(self, totals, logged):
+        """ Append the next calendar day and slide every window by one """
+        i = len(self.logged)
+        for macro, value in zip(MACROS, totals):
+            self.values[macro].append(value)
+        self.logged.append(logged)
+
+        for window in self.windows:
+            sums = self._sums[window]
+            leaving = i - window
+            if logged:
+                self._counts[window] += 1
+            if leaving >= 0 and self.logged[leaving]:
+                self._counts[window] -= 1
+            for macro, value in zip(MACROS, totals):
+                sums[macro] += value - (self.values[macro][leaving] if leaving >= 0 else 0.0)
+            count = self._counts[window]
+            for macro in MACROS:
+                self.averages[window][macro].append(sums[macro] / count if count else None)
+
+        if logged:
+            self._score(i, totals, 1)
+        under = logged and meets("calories", totals[0], self._goals_on(i)["calories"])
+        self.streaks.append(self.streaks[-1] + 1 if under and self.streaks else int(under))
+        if self._best is not None:
+            self._best = max(self._best, self.streaks[-1])
+
+    def _pop(self):
+        """ Undo the last _step """
+        i = len(self.logged) - 1
+        totals = [self.values[macro][i] for macro in MACROS]
+        logged = self.logged[i]
+        for window in self.windows:
+            sums = self._sums[window]
+            leaving = i - window
+            if logged:
+                self._counts[window] -= 1
+            if leaving >= 0 and self.logged[leaving]:
+                self._counts[window] += 1
+            for macro, value in zip(MACROS, totals):
+                sums[macro] -= value - (self.values[macro][leaving] if leaving >= 0 else 0.0)
+                self.averages[window][macro].pop()
+        if logged:
+            self._score(i, totals, -1)
+        if self.streaks.pop() == self._best:
+            self._best = None
+        for macro in MACROS:
+            self.values[macro].pop()
+        self.logged.pop()
+
+    def _goals_on(self, i):
+        if hasattr(self.goals, "for_day"):
+            return self.goals.for_day(self.first + i)
+        return self.goals
+
+    def _score(self, i, totals, sign):
+        self._logged_days += sign
+        goals = self._goals_on(i)
+        for macro, value in zip(MACROS, totals):
+            if meets(macro, value, goals[macro]):
+                self._hits[macro] += sign
+        day = weekday(self.first + i)
+        self._weekday_counts[day] += sign
+        for macro, value in zip(MACROS, totals):
+            self._weekday_sums[day][macro] += sign * value
+
+    def _days(self):
+        return {self.first + i: [self.values[macro][i] for macro in MACROS]
+                for i, logged in enumerate(self.logged) if logged}
+
+    def _reset(self, first):
+        self.__init__(self.goals, self.windows)
+        self.first = first
+
+    def _replay(self, days):
+        for day in sorted(days):
+            self.set_day(day_string(day), days[day])
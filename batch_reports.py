@@ -0,0 +1,248 @@
+""" Render weekly PDF/PNG reports for many users without the GUI.
+
+Usage: python batch_reports.py users/ [more files or globs ...] [--out reports] [--week 2024-05-06]
+                               [--workers N] [--force]
+
+Each data file (JSON, SQLite or binary log, as picked by get_store) is one
+user; directories are scanned for them. For the week starting on the
+given Monday (default: last week) every user gets
+``<out>/<user>/week-<monday>.pdf`` with the week's foods and totals, and
+``week-<monday>.png`` with the calories per day.
+
+Users are rendered in parallel worker processes on the Agg backend. Each
+worker builds the chart figure once and only updates its bars for every
+user after that. Files are written to a temporary name and renamed into
+place, so a report is either the old one or the complete new one.
+``<out>/manifest.json`` keeps a hash of each user's data files and the
+week; users whose hash is unchanged since the last run are skipped.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+
+from records import day_string, period_start, today, week_number
+from storage import BINARY_EXTENSIONS, SQLITE_EXTENSIONS, open_store
+
+DATA_EXTENSIONS = (".json",) + SQLITE_EXTENSIONS + BINARY_EXTENSIONS
+
+# Files next to the data that are not user data themselves
+SIDECAR_SUFFIXES = (".goals.json", ".rollups.json")
+
+# Files a store keeps besides its main one; their content is part of the data
+COMPANION_SUFFIXES = (".journal", ".compacting", "-wal", ".names")
+
+# Bump when the report layout changes so every user is rendered again
+REPORT_VERSION = 1
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# Write the manifest every this many finished users, so an interrupted run keeps its progress
+MANIFEST_EVERY = 200
+
+# Per-worker chart template, built by _init_worker
+_chart = None
+
+
+class WeeklyChart:
+    """ A calories-per-day bar chart for one week, drawn into the same figure every time """
+
+    def __init__(self):
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(8, 3), dpi=100)
+        self.ax = self.fig.add_subplot()
+        self.bars = self.ax.bar(range(len(WEEKDAYS)), [0] * len(WEEKDAYS), color="green")
+        self.ax.set_xticks(range(len(WEEKDAYS)))
+        self.ax.set_title("Calories per Day")
+        # Fixed margins: tight_layout would draw the whole figure a second time for every user
+        self.fig.subplots_adjust(left=0.08, right=0.98, bottom=0.18, top=0.9)
+
+    def render(self, week, totals):
+        """ PNG bytes of the chart for the week starting on ``week`` given {date: calories} """
+        start = date.fromisoformat(week)
+        labels = []
+        for i, bar in enumerate(self.bars):
+            day = (start + timedelta(days=i)).isoformat()
+            bar.set_height(totals.get(day, 0))
+            labels.append(f"{WEEKDAYS[i]}\n{day[5:]}")
+        self.ax.set_xticklabels(labels, fontsize=8)
+        self.ax.set_ylim(0, max(totals.values(), default=0) * 1.1 or 1)
+        png = BytesIO()
+        self.fig.savefig(png, format="png")
+        return png.getvalue()
+
+
+def _init_worker():
+    global _chart
+    import matplotlib
+
+    matplotlib.use("Agg")
+    _chart = WeeklyChart()
+
+
+def find_data_files(sources):
+    """ Expand directories and glob patterns into the data files they hold, sorted """
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            names = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            names = glob.glob(source) or [source]
+        for path in names:
+            if path.endswith(DATA_EXTENSIONS) and not path.endswith(SIDECAR_SUFFIXES) and os.path.isfile(path):
+                paths.add(path)
+    return sorted(paths)
+
+
+def user_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def content_hash(path, week):
+    """ Hash of the data file, the files its store keeps beside it, the week and the report version """
+    digest = hashlib.sha256(f"{REPORT_VERSION}:{week}".encode())
+    for name in (path,) + tuple(path + suffix for suffix in COMPANION_SUFFIXES):
+        try:
+            f = open(name, "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            digest.update(os.path.basename(name).encode())
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    """ Call write(tmp_path), then move the finished file over path """
+    tmp_path = path + ".tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_user(job):
+    """ Render one user's weekly report in a worker; returns (user, status, hash or error message) """
+    from report import write_report
+
+    path, out_dir, week, previous, force = job
+    user = user_name(path)
+    try:
+        digest = content_hash(path, week)
+        user_dir = os.path.join(out_dir, user)
+        pdf_path = os.path.join(user_dir, f"week-{week}.pdf")
+        png_path = os.path.join(user_dir, f"week-{week}.png")
+        if not force and digest == previous.get("hash"):
+            if previous.get("status") == "empty" or (os.path.exists(pdf_path) and os.path.exists(png_path)):
+                return user, "unchanged", digest
+
+        end = (date.fromisoformat(week) + timedelta(days=6)).isoformat()
+        store = open_store(path)
+        try:
+            records = list(store.query(week, end))
+        finally:
+            if hasattr(store, "close"):
+                store.close()
+        if not records:
+            return user, "empty", digest
+
+        totals = {}
+        for food in records:
+            totals[food["date"]] = totals.get(food["date"], 0) + food["calories"]
+        png = _chart.render(week, totals)
+
+        def write_png(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+
+        os.makedirs(user_dir, exist_ok=True)
+        write_atomic(png_path, write_png)
+        write_atomic(pdf_path, lambda tmp_path: write_report(
+            records, tmp_path, f"Weekly Report: {user}, week of {week}",
+            chart=lambda days, calories: BytesIO(png),
+        ))
+        return user, "rendered", digest
+    except Exception as e:
+        return user, "failed", f"{path}: {e}"
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        print(f"Ignoring unreadable manifest {path}; every user will be rendered", file=sys.stderr)
+        return {}
+
+
+def save_manifest(path, manifest):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    write_atomic(path, write)
+
+
+def last_week():
+    return day_string(period_start(week_number(today()) - 1, "Weekly"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="user data files, directories of them, or glob patterns")
+    parser.add_argument("--out", default="reports", help="output directory")
+    parser.add_argument("--week", help="Monday starting the week to report (default: last week)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--force", action="store_true", help="render users even if their data is unchanged")
+    args = parser.parse_args()
+
+    week = args.week or last_week()
+    monday = date.fromisoformat(week)
+    if monday.weekday():
+        monday -= timedelta(days=monday.weekday())
+        print(f"{week} is not a Monday; reporting the week of {monday}")
+    week = monday.isoformat()
+
+    paths = find_data_files(args.sources)
+    if not paths:
+        sys.exit("No user data files found")
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, "manifest.json")
+    manifest = load_manifest(manifest_path)
+
+    jobs = [(path, args.out, week, manifest.get(user_name(path), {}), args.force) for path in paths]
+    counts = dict.fromkeys(("rendered", "unchanged", "empty", "failed"), 0)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+        chunksize = max(1, min(32, len(jobs) // (4 * args.workers)))
+        for done, (user, status, result) in enumerate(executor.map(render_user, jobs, chunksize=chunksize), 1):
+            counts[status] += 1
+            if status == "failed":
+                print(f"Failed: {result}", file=sys.stderr)
+            elif status != "unchanged":
+                manifest[user] = {"hash": result, "week": week, "status": status}
+            if done % MANIFEST_EVERY == 0:
+                save_manifest(manifest_path, manifest)
+    save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{count} {status}" for status, count in counts.items()) + f" in {elapsed:.1f}s")
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+""" Bytes per record of each in-memory history representation.
+
+Parses the same synthetic history (1M records by default) from JSON into
+each representation and reports the memory it keeps, per record, as
+measured by tracemalloc:
+
+    dicts          what load_data returns: one dict per record, fresh name and date strings
+    dataclass      the old @dataclass Food, one per record
+    slotted        records.Food: slotted and frozen, interned name, integer day
+    foodlog        the columnar FoodLog built from the slotted rows
+
+Usage: python benchmarks/bench_record_memory.py [--count 1000000] [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from foodlog import FoodLog  # noqa: E402
+from records import Food  # noqa: E402
+
+
+# The record type the entry points used before records.Food
+@dataclass
+class DataclassFood:
+    name: str
+    calories: int
+    protein: int
+    fat: int
+    carbs: int
+    date: str
+
+
+def retained(build):
+    """ Return (result, bytes still allocated once build() has returned) """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10 ** 6)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    # Parsing from text gives every record its own strings, as loading data.json does
+    text = json.dumps(list(synthetic.generate(args.count)))
+    count = args.count
+    results = {}
+
+    _, size = retained(lambda: json.loads(text))
+    results["dicts"] = size
+    _, size = retained(lambda: json.loads(text, object_hook=lambda record: DataclassFood(**record)))
+    results["dataclass"] = size
+
+    foods, size = retained(lambda: json.loads(text, object_hook=Food.from_dict))
+    results["slotted"] = size
+    _, size = retained(lambda: FoodLog.from_records(foods))
+    results["foodlog"] = size
+
+    per_record = {name: round(size / count, 1) for name, size in results.items()}
+    if args.json:
+        print(json.dumps({"count": count, "bytes_per_record": per_record}))
+        return
+    print(f"{count} records")
+    for name, value in per_record.items():
+        print(f"  {name:<10} {value:>8.1f} bytes/record  {results[name] / 2 ** 20:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
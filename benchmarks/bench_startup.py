@@ -0,0 +1,62 @@
+""" Cold-start benchmark for caloriegui.py.
+
+Times, in a fresh interpreter, how long it takes to import the app and show
+the goals page, and fails if that exceeds the budget or if numpy,
+matplotlib or reportlab got imported on the way.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget 0.5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("numpy", "matplotlib", "reportlab")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import tkinter as tk
+import caloriegui
+root = tk.Tk()
+app = caloriegui.CalorieTrackerApp(root, prewarm=False)
+root.update()
+elapsed = time.perf_counter() - start
+root.destroy()
+heavy = sorted(m for m in %r if m in sys.modules)
+print(json.dumps({"seconds": elapsed, "heavy_modules": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once():
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=REPO, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Startup run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.5, help="maximum median startup time in seconds")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    median = statistics.median(r["seconds"] for r in runs)
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    print(json.dumps({"median_seconds": round(median, 4), "runs": args.runs, "heavy_modules": heavy}))
+
+    if heavy:
+        raise SystemExit(f"Startup imported heavy modules: {', '.join(heavy)}")
+    if median > args.budget:
+        raise SystemExit(f"Startup took {median:.3f}s, over the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
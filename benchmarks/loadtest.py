@@ -0,0 +1,161 @@
+""" Load test for server.py.
+
+Starts a server on a free local port with a throwaway data directory (or
+targets --url), then runs concurrent keep-alive clients that each act as
+one user: mostly adding foods, with range queries and rollups mixed in.
+Reports p50/p99 latency per request type and overall requests/second.
+
+Usage: python benchmarks/loadtest.py [--clients 50] [--requests 200] [--users 20] [--url http://host:port]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Share of requests of each kind
+MIX = (("add", 0.6), ("foods", 0.15), ("rollup", 0.25))
+
+FOODS = ("oatmeal", "banana", "chicken breast", "rice", "salad", "yogurt", "pasta", "apple")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise SystemExit(f"Server on {host}:{port} did not start")
+
+
+async def request(reader, writer, host, method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, user, count, rng, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    day = date(2024, 1, 1)
+    try:
+        for _ in range(count):
+            kind = rng.choices([k for k, _ in MIX], [w for _, w in MIX])[0]
+            if kind == "add":
+                day += timedelta(days=rng.random() < 0.3)
+                method, path = "POST", f"/users/{user}/foods"
+                body = {"name": rng.choice(FOODS), "calories": rng.randint(50, 900), "protein": rng.randint(0, 60),
+                        "fat": rng.randint(0, 40), "carbs": rng.randint(0, 100), "date": day.isoformat()}
+            elif kind == "foods":
+                method, path, body = "GET", f"/users/{user}/foods?start={(day - timedelta(days=7)).isoformat()}", None
+            else:
+                method, path, body = "GET", f"/users/{user}/rollups/{rng.choice(('daily', 'weekly', 'monthly'))}", None
+            start = time.perf_counter()
+            status = await request(reader, writer, host, method, path, body)
+            latencies[kind].append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(host, port, clients, requests_per_client, users, seed):
+    await wait_for_server(host, port)
+    latencies = {kind: [] for kind, _ in MIX}
+    errors = []
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, f"user{i % users}", requests_per_client, random.Random(rng.random()), latencies, errors)
+        for i in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    every = [value for values in latencies.values() for value in values]
+    result = {
+        "clients": clients,
+        "requests": len(every),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(every) / elapsed, 1),
+        "p50_ms": round(1000 * statistics.median(every), 2),
+        "p99_ms": round(1000 * percentile(every, 0.99), 2),
+    }
+    for kind, values in latencies.items():
+        if values:
+            result[kind] = {"count": len(values), "p50_ms": round(1000 * statistics.median(values), 2),
+                            "p99_ms": round(1000 * percentile(values, 0.99), 2)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--users", type=int, default=20, help="distinct users the clients act as")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    args = parser.parse_args()
+
+    server = None
+    tmp = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(REPO, "server.py"), "--host", host, "--port", str(port), "--data-dir", tmp.name],
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        result = asyncio.run(run(host, port, args.clients, args.requests, args.users, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            tmp.cleanup()
+    print(json.dumps(result, indent=2))
+    if result["errors"]:
+        raise SystemExit(f"{result['errors']} requests failed")
+
+
+if __name__ == "__main__":
+    main()
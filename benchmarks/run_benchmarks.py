@@ -0,0 +1,300 @@
+""" Benchmark suite for the tracker's hot paths.
+
+For each history size, a deterministic synthetic history (see synthetic.py)
+is written to a scratch directory and every stage is timed:
+
+    save          save_data of the whole history
+    load          load_data
+    columnar      FoodLog.from_records
+    insert        adding foods the way the app does (store append + rollup update and save)
+    filter        30-day slice_by_date queries on the FoodLog
+    filter_stream iter_records over one month, straight from the store
+    rollup_build  RollupCache.build (the group_data_by_period tables)
+    rollup_query  Weekly/Monthly grouped tables plus a full-range pyramid query
+    chart         aggregate, downsample and render the dashboard panels with Agg
+    pdf           write_report of the whole history
+
+The fixture keeps the history only as a columnar FoodLog (tens of bytes
+per record). The save and columnar stages also need it as a list of record
+dicts, about 450 bytes per record, which is built the first time one of
+them runs; at 10**7 records that alone takes several GB, so leave those
+two stages (and load, which measures exactly that) out on smaller
+machines.
+
+Each stage runs --repeat times for timing and once more under tracemalloc
+for its peak traced memory. Results are written as JSON (by default to
+benchmarks/results/<commit>.json); --compare prints the change against an
+earlier results file.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1e3,1e4,1e5] [--backend json|sqlite]
+                                           [--stages load,filter] [--repeat 3] [--compare OLD.json]
+"""
+import argparse
+import copy
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+from foodlog import MACROS, FoodLog, aggregate, load_log  # noqa: E402
+from lod import reduce_summary  # noqa: E402
+from report import write_report  # noqa: E402
+from rollups import RollupCache  # noqa: E402
+
+STAGES = ("save", "load", "columnar", "insert", "filter", "filter_stream",
+          "rollup_build", "rollup_query", "chart", "pdf")
+
+# Foods added per insert run, and queries per filter run
+INSERTS = 100
+FILTER_QUERIES = 1000
+
+# The PDF stage is skipped above this many records unless --pdf-max is raised
+PDF_MAX = 100000
+
+
+class Fixture:
+    """ One size's scratch directory, data file and the in-memory state stages share """
+
+    def __init__(self, workdir, size, backend, seed):
+        self.workdir = workdir
+        self.size = size
+        self.path = os.path.join(workdir, "data.db" if backend == "sqlite" else "data.json")
+        synthetic.write(self.path, size, seed)
+        # Parsed straight into the columnar log; the dict list is only built for stages that use it
+        self.log = load_log(self.path)
+        self._records = None
+        self.rollups = RollupCache.build(self.log, os.path.join(workdir, "data.rollups.json"))
+        self.last = self.log.dates[-1].astype(object) if len(self.log) else date.today()
+
+    @property
+    def records(self):
+        """ The history as record dicts, loaded the first time a stage asks for it """
+        if self._records is None:
+            self._records = storage.get_store(self.path).load()
+        return self._records
+
+    def scratch_copy(self):
+        """ Copy the data file so a mutating stage leaves the fixture untouched """
+        path = os.path.join(self.workdir, "scratch" + os.path.splitext(self.path)[1])
+        for suffix in ("", ".journal", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        storage._stores.pop(path, None)
+        shutil.copyfile(self.path, path)
+        return path
+
+
+def stage_save(fx):
+    path = os.path.join(fx.workdir, "saved" + os.path.splitext(fx.path)[1])
+    storage._stores.pop(path, None)
+    return lambda: storage.save_data(fx.records, path)
+
+
+def stage_load(fx):
+    return lambda: storage.load_data(fx.path)
+
+
+def stage_columnar(fx):
+    return lambda: FoodLog.from_records(fx.records)
+
+
+def stage_insert(fx):
+    path = fx.scratch_copy()
+    log = fx.log.copy()
+    rollups = RollupCache(os.path.join(fx.workdir, "scratch.rollups.json"))
+    rollups.tables, rollups.count = copy.deepcopy(fx.rollups.tables), fx.rollups.count
+    foods = list(synthetic.generate(INSERTS, seed=1, start=fx.last))
+
+    def run():
+        # What CalorieTrackerApp.add_food and save_food do per food
+        for food in foods:
+            log.append(food)
+            storage.append_food(food, path)
+            rollups.add(food)
+            rollups.save()
+        # Include any journal compaction the appends triggered
+        store = storage.get_store(path)
+        if hasattr(store, "wait"):
+            store.wait()
+
+    return run
+
+
+def stage_filter(fx):
+    starts = [fx.last - timedelta(days=int(offset)) for offset in np.linspace(30, 3650, 16)]
+
+    def run():
+        for i in range(FILTER_QUERIES):
+            start = starts[i % len(starts)]
+            fx.log.slice_by_date(start, start + timedelta(days=29))
+
+    return run
+
+
+def stage_filter_stream(fx):
+    start = fx.last - timedelta(days=30)
+    return lambda: sum(1 for _ in storage.iter_records(start, fx.last, fx.path))
+
+
+def stage_rollup_build(fx):
+    return lambda: RollupCache.build(fx.log)
+
+
+def stage_rollup_query(fx):
+    def run():
+        fx.rollups._pyramid = None
+        for period in ("Weekly", "Monthly"):
+            fx.rollups.grouped(period)
+        fx.rollups.pyramid().query(400)
+
+    return run
+
+
+def stage_chart(fx):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    def run():
+        # Same panels as dashboard.Dashboard, rendered off-screen
+        series = reduce_summary(aggregate(fx.log), 400)
+        totals = {macro: series["sum"][macro].sum() for macro in MACROS}
+        figure = Figure(figsize=(8, 6))
+        canvas = FigureCanvasAgg(figure)
+        axs = figure.subplots(2, 2)
+        x = np.arange(len(series["dates"]))
+        for pos, macro in (((0, 0), "calories"), ((1, 0), "protein"), ((1, 1), "fat")):
+            axs[pos].bar(x, series["mean"][macro], color="C0")
+            axs[pos].vlines(x, series["min"][macro], series["max"][macro], colors="black", linewidths=0.8)
+        axs[0, 1].pie([max(totals[m], 0) + 1e-9 for m in ("protein", "fat", "carbs")],
+                      labels=["Protein", "Fat", "Carbs"], autopct="%1.1f%%")
+        canvas.print_png(io.BytesIO())
+
+    return run
+
+
+def stage_pdf(fx):
+    path = os.path.join(fx.workdir, "report.pdf")
+    return lambda: write_report(storage.iter_records(path=fx.path), path)
+
+
+def measure(make_run, fx, repeat):
+    """ Time make_run(fx)() repeat times, then once more for the tracemalloc peak """
+    times = []
+    for _ in range(repeat):
+        run = make_run(fx)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    run = make_run(fx)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds_min": round(min(times), 6),
+        "seconds_median": round(statistics.median(times), 6),
+        "runs": repeat,
+        "peak_bytes": peak,
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO,
+                               capture_output=True, text=True).stdout.strip()
+        return result.stdout.strip() + ("-dirty" if dirty else "") or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"{'size':>9} {'stage':<14} {'time':>9} {'change':>8} {'peak':>10} {'change':>8}")
+    for r in results:
+        old = baseline.get((r["size"], r["stage"]))
+        time_change = peak_change = "new"
+        if old:
+            time_change = f"{r['seconds_median'] / max(old['seconds_median'], 1e-9) - 1:+.0%}"
+            peak_change = f"{r['peak_bytes'] / max(old['peak_bytes'], 1) - 1:+.0%}"
+        print(f"{r['size']:>9} {r['stage']:<14} {r['seconds_median']:>8.4f}s {time_change:>8} "
+              f"{r['peak_bytes'] / 2 ** 20:>8.1f}MB {peak_change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1e3,1e4,1e5", help="comma-separated record counts, up to 1e7 "
+                        "(the save, load and columnar stages hold the history as dicts; leave them out at 1e7)")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of " + ", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf-max", type=int, default=PDF_MAX, help="largest size the pdf stage runs at")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="OLD.json", help="print changes against an earlier results file")
+    args = parser.parse_args()
+
+    sizes = [int(float(size)) for size in args.sizes.split(",")]
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    commit = git_commit()
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            fx = Fixture(workdir, size, args.backend, args.seed)
+            for stage in stages:
+                if stage == "pdf" and size > args.pdf_max:
+                    continue
+                result = {"size": size, "stage": stage, **measure(globals()["stage_" + stage], fx, args.repeat)}
+                results.append(result)
+                print(f"{size:>9} {stage:<14} {result['seconds_median']:>9.4f}s {result['peak_bytes'] / 2 ** 20:>8.1f}MB",
+                      flush=True)
+            for store in list(storage._stores):
+                if store.startswith(workdir):
+                    getattr(storage._stores.pop(store), "close", lambda: None)()
+
+    out = args.out or os.path.join(REPO, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "commit": commit,
+            "backend": args.backend,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
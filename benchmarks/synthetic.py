@@ -0,0 +1,101 @@
+""" Deterministic synthetic food histories for benchmarks.
+
+The same (count, seed) always yields the same records. Days hold three to
+six entries drawn from a fixed menu, with portions scaled around a typical
+serving so calories stay consistent with the macros. Histories longer than
+MAX_YEARS squeeze more entries into each day rather than running past the
+calendar.
+
+Usage: python benchmarks/synthetic.py COUNT OUT.json|OUT.db [--seed 0]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Name and per-serving protein, fat and carbs (grams)
+MENU = (
+    ("oatmeal", 5, 3, 27), ("banana", 1, 0, 27), ("greek yogurt", 17, 4, 6), ("scrambled eggs", 12, 10, 2),
+    ("toast with butter", 3, 8, 15), ("chicken breast", 31, 4, 0), ("brown rice", 5, 2, 45),
+    ("caesar salad", 7, 17, 8), ("turkey sandwich", 24, 12, 35), ("spaghetti bolognese", 25, 18, 70),
+    ("salmon fillet", 25, 13, 0), ("steamed broccoli", 3, 0, 7), ("apple", 0, 0, 25), ("almonds", 6, 14, 6),
+    ("protein shake", 25, 2, 5), ("pizza slice", 12, 10, 33), ("burrito", 22, 18, 60), ("lentil soup", 12, 3, 30),
+    ("cheeseburger", 28, 26, 35), ("ice cream", 4, 14, 28), ("coffee with milk", 2, 2, 3), ("orange juice", 2, 0, 26),
+)
+
+START = date(2000, 1, 1)
+MAX_YEARS = 25
+ENTRIES_PER_DAY = (3, 6)
+
+
+def generate(count, seed=0, start=START):
+    """ Yield count food records in date order """
+    rng = random.Random(seed)
+    max_days = MAX_YEARS * 365
+    # Average entries per day needed to fit the history into MAX_YEARS
+    squeeze = max(1.0, count / (max_days * sum(ENTRIES_PER_DAY) / 2))
+    day = start
+    produced = 0
+    while produced < count:
+        low, high = ENTRIES_PER_DAY
+        entries = min(count - produced, int(rng.randint(low, high) * squeeze))
+        food_date = day.isoformat()
+        for _ in range(entries):
+            name, protein, fat, carbs = rng.choice(MENU)
+            portion = rng.choice((0.5, 0.75, 1, 1, 1, 1.25, 1.5, 2))
+            protein, fat, carbs = round(protein * portion, 1), round(fat * portion, 1), round(carbs * portion, 1)
+            yield {
+                "name": name,
+                "calories": int(round(4 * protein + 9 * fat + 4 * carbs)),
+                "protein": protein,
+                "fat": fat,
+                "carbs": carbs,
+                "date": food_date,
+            }
+        produced += entries
+        day += timedelta(days=1)
+
+
+def write(path, count, seed=0, batch_size=10000):
+    """ Write a synthetic history to a data.json-style snapshot or a SQLite file.
+
+    The JSON snapshot is streamed in the indented format ``save_data``
+    writes, so even 10**7 records never sit in memory at once.
+    """
+    from storage import SQLITE_EXTENSIONS, SqliteStore
+
+    if path.endswith(SQLITE_EXTENSIONS):
+        store = SqliteStore(path)
+        batch = []
+        for record in generate(count, seed):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                store.append_many(batch)
+                batch = []
+        store.append_many(batch)
+        store.close()
+        return
+
+    with open(path, "w") as f:
+        f.write("[")
+        for i, record in enumerate(generate(count, seed)):
+            f.write(",\n    " if i else "\n    ")
+            f.write(json.dumps(record, indent=4).replace("\n", "\n    "))
+        f.write("\n]" if count else "]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int)
+    parser.add_argument("out", help="data.json-style file, or .db/.sqlite for the SQLite backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write(args.out, args.count, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+""" Fixed-width binary food log, read through mmap.
+
+A ``.ctlog`` file is a 32-byte header followed by one packed 28-byte row
+per food:
+
+    header  magic "CTLOG", format version, row size, macro scale, row count
+    row     day (int64 days since 1970-01-01), name id (int32),
+            calories, protein, fat, carbs (int32, kcal or grams * scale)
+
+Version 1 files kept whole kcal; they are still read, and rewritten in
+the current version before the first append.
+
+Names live in an append-only dictionary next to the log (``<path>.names``,
+one JSON string per line); a row's name id is its line number. Appends
+write the names, then the rows, then bump the header's row count, so a
+crash part-way leaves rows past the count that are ignored and overwritten.
+
+Opening a log maps the file and wraps it in NumPy views without parsing or
+copying anything; ``log()`` hands the date and name columns to a FoodLog
+as they are.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+from foodlog import MACROS, FoodLog, _number
+from storage import CorruptDataError, _add_own, _is_own, _own_ranges, file_key, file_lock
+
+MAGIC = b"CTLOG\x00\x00\x00"
+VERSION = 2
+
+# Macros are stored in hundredths of a kcal or gram
+SCALE = 100
+
+# Scale of the calories column by format version
+CALORIE_SCALES = {1: 1, 2: SCALE}
+
+HEADER = struct.Struct("<8sHHIQ8x")
+
+ROW = np.dtype([
+    ("day", "<i8"),
+    ("name", "<i4"),
+    ("calories", "<i4"),
+    ("protein", "<i4"),
+    ("fat", "<i4"),
+    ("carbs", "<i4"),
+])
+
+
+class BinaryLogError(CorruptDataError):
+    """ Raised when a file is not a food log this version can read """
+
+
+class BinaryStore:
+    """ Store backend over a ``.ctlog`` file, with the same interface as JournalStore """
+
+    def __init__(self, path):
+        self.path = path
+        self.names_path = path + ".names"
+        self._lock = threading.Lock()
+        self._names = None
+        self._codes = None
+        # Key of the names file as last read or written here; another process adding names changes it
+        self._names_key = None
+        # Rows this process appended, as (first index, end index) ranges
+        self._own = []
+        self._loaded = (0, None)
+        # Calories scale of the file rows() last read
+        self._calorie_scale = SCALE
+
+    def rows(self):
+        """ Return a read-only structured view of the rows the header counts """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return np.zeros(0, dtype=ROW)
+        with f:
+            count, self._calorie_scale = self._read_header(f)
+            if count == 0:
+                return np.zeros(0, dtype=ROW)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # The view keeps the mapping alive after the file is closed
+        return np.frombuffer(mapped, dtype=ROW, count=count, offset=HEADER.size)
+
+    def log(self):
+        """ Return the history as a FoodLog whose dates and names are views of the mapped file """
+        with self._lock:
+            key = file_key(self.path)
+            rows = self.rows()
+            names = list(self._names_for(rows))
+            self._loaded = (len(rows), key)
+            calorie_scale = self._calorie_scale
+        return self._as_log(rows, names, calorie_scale)
+
+    def cursor(self):
+        """ Position just past the rows the last ``log`` or ``load`` returned, for ``read_new`` """
+        return self._loaded
+
+    def read_new(self, cursor):
+        """ Return (records other processes appended since cursor, new cursor).
+
+        One stat when nothing changed; otherwise only the rows past the
+        cursor are decoded. The records are None if the log was rewritten
+        (``save`` replaces the file) and must be loaded again.
+        """
+        count, key = cursor
+        current = file_key(self.path)
+        if current == key:
+            return [], cursor
+        if current is None or (key is not None and current[0] != key[0] and count):
+            return None, cursor
+        with self._lock:
+            rows = self.rows()
+            if len(rows) < count:
+                return None, cursor
+            new = rows[count:]
+            names = list(self._names_for(new))
+            calorie_scale = self._calorie_scale
+            own = self._own
+            self._own = _own_ranges(own, len(rows))
+        new = new[[not _is_own(own, i) for i in range(count, len(rows))]]
+        log = self._as_log(new, names, calorie_scale)
+        return [log.record(i) for i in range(len(log))], (len(rows), current)
+
+    def load(self, object_hook=None):
+        if object_hook is None:
+            return list(self.query())
+        return [object_hook(record) for record in self.query()]
+
+    def query(self, start=None, end=None):
+        """ Yield the records dated between start and end (inclusive) in date order """
+        log = self.log()
+        lo, hi = log.date_range(start, end)
+        for i in range(lo, hi):
+            yield log.record(i)
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, compact=True):
+        """ Append rows in place; compact is accepted for interface parity """
+        if not records:
+            return
+        with self._lock, file_lock(self.path):
+            if file_key(self.names_path) != self._names_key:
+                # Another process added names; reload them so codes stay unique
+                self._names = None
+            rows = self._pack(records)
+            if not os.path.exists(self.path):
+                self._write_log(self.path, rows)
+                _add_own(self._own, 0, len(rows))
+                return
+            self._upgrade()
+            with open(self.path, "r+b") as f:
+                count, _ = self._read_header(f)
+                _add_own(self._own, count, count + len(rows))
+                f.seek(HEADER.size + count * ROW.itemsize)
+                f.write(rows.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+                # Rows only count once the header says so
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, ROW.itemsize, SCALE, count + len(rows)))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def save(self, data):
+        """ Replace every stored record with data """
+        with self._lock, file_lock(self.path):
+            if file_key(self.names_path) != self._names_key:
+                self._names = None
+            # The name dictionary only ever grows, so it stays valid for the old file until the swap
+            self._write_log(self.path, self._pack(data))
+            self._own = []
+
+    def close(self):
+        pass
+
+    def _pack(self, records):
+        codes = self._load_codes()
+        new_names = []
+        name_ids = []
+        for record in records:
+            name = str(record.get("name", record.get("food", "")))
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(self._names)
+                self._names.append(name)
+                new_names.append(name)
+            name_ids.append(code)
+
+        rows = np.zeros(len(records), dtype=ROW)
+        rows["day"] = np.array([record["date"] for record in records], dtype="datetime64[D]").astype(np.int64)
+        rows["name"] = name_ids
+        for macro in MACROS:
+            rows[macro] = np.round(np.array([_number(record.get(macro, 0)) for record in records]) * SCALE)
+
+        if new_names:
+            with open(self.names_path, "a") as f:
+                f.write("".join(json.dumps(name) + "\n" for name in new_names))
+                f.flush()
+                os.fsync(f.fileno())
+            self._names_key = file_key(self.names_path)
+        return rows
+
+    def _as_log(self, rows, names, calorie_scale=SCALE):
+        dates = rows["day"].view("datetime64[D]")
+        columns = {"calories": rows["calories"] / calorie_scale}
+        for macro in MACROS[1:]:
+            columns[macro] = rows[macro] / SCALE
+        return FoodLog.from_columns(names, rows["name"], dates, columns)
+
+    def _names_for(self, rows):
+        """ The name dictionary, re-read if rows use ids another process added since it was loaded """
+        names = self._load_names()
+        if len(rows) and int(rows["name"].max()) >= len(names):
+            self._names = None
+            names = self._load_names()
+        return names
+
+    def _write_log(self, path, rows):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, ROW.itemsize, SCALE, len(rows)))
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read_header(self, f):
+        raw = f.read(HEADER.size)
+        if not raw:
+            return 0, CALORIE_SCALES[VERSION]
+        if len(raw) < HEADER.size:
+            raise BinaryLogError(f"{self.path}: truncated header")
+        magic, version, row_size, scale, count = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise BinaryLogError(f"{self.path} is not a food log")
+        if version not in CALORIE_SCALES or row_size != ROW.itemsize or scale != SCALE:
+            raise BinaryLogError(f"{self.path}: unsupported format version {version}")
+        # A crash between writing rows and the header leaves the count authoritative
+        available = (os.fstat(f.fileno()).st_size - HEADER.size) // ROW.itemsize
+        return min(count, available), CALORIE_SCALES[version]
+
+    def _upgrade(self):
+        """ Rewrite a version 1 file (whole kcal) in the current version; runs with file_lock held """
+        with open(self.path, "rb") as f:
+            _, calorie_scale = self._read_header(f)
+        if calorie_scale == SCALE:
+            return
+        rows = np.array(self.rows())
+        rows["calories"] *= SCALE // calorie_scale
+        self._write_log(self.path, rows)
+
+    def _load_names(self, repair=False):
+        """ The name dictionary; ``repair`` (only with file_lock held) also cuts a torn last line """
+        if self._names is None:
+            self._names_key = file_key(self.names_path)
+            names = []
+            good = 0
+            try:
+                with open(self.names_path, "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = b""
+            for line in content.splitlines(keepends=True):
+                # A torn last line belongs to rows that were never counted
+                if not line.endswith(b"\n"):
+                    break
+                names.append(json.loads(line))
+                good += len(line)
+            if good < len(content):
+                if repair:
+                    with open(self.names_path, "r+b") as f:
+                        f.truncate(good)
+                else:
+                    # Possibly a name another process is writing under the lock; a writer must read again
+                    self._names_key = None
+            self._names = names
+            self._codes = {name: i for i, name in enumerate(names)}
+        return self._names
+
+    def _load_codes(self):
+        self._load_names(repair=True)
+        return self._codes
@@ -0,0 +1,207 @@
+""" Bulk-import food records from CSV or JSON-lines exports of other trackers.
+
+Usage: python bulk_import.py export.csv [more.jsonl ...] [--map calories=kcal] [--rejects rejects.csv]
+
+Files are read in chunks of lines that are parsed and validated in parallel
+worker processes, so memory stays bounded by the chunk size. Valid rows are
+mapped onto the Food fields (name, calories, protein, fat, carbs, date),
+deduplicated against the stored history, and committed one chunk per
+batch. Identical foods on the same day are real repeat entries, so
+duplicates are counted, not just matched: the n-th copy of a row in a file
+is skipped only if the history already holds n copies of it, which makes
+importing the same file twice a no-op. Rejected rows are written to a CSV report.
+CSV files must not contain newlines inside quoted fields.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from records import MACROS
+from storage import DATA_FILE, JournalStore, get_store
+
+FIELDS = ("name", "calories", "protein", "fat", "carbs", "date")
+
+# Columns tried for a field when --map does not name one
+DEFAULT_COLUMNS = {"name": ("name", "food")}
+
+CHUNK_LINES = 50000
+
+
+def record_key(record):
+    """ Hash identifying a record for deduplication """
+    return hash(tuple(record[field] for field in FIELDS))
+
+
+def _number(value):
+    number = float(value)
+    if number != number or number < 0:
+        raise ValueError(f"invalid amount {value!r}")
+    return int(number) if number.is_integer() else number
+
+
+def validate(row, mapping):
+    """ Map a parsed row onto the Food fields, raising ValueError if it is unusable """
+    record = {}
+    for field in FIELDS:
+        for column in mapping[field]:
+            if column in row and row[column] not in (None, ""):
+                record[field] = row[column]
+                break
+        else:
+            raise ValueError(f"missing {field}")
+    record["name"] = str(record["name"]).strip()
+    if not record["name"]:
+        raise ValueError("missing name")
+    for macro in MACROS:
+        try:
+            record[macro] = _number(record[macro])
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid {macro} {record[macro]!r}")
+    try:
+        record["date"] = date.fromisoformat(str(record["date"])[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"invalid date {record['date']!r}")
+    return record
+
+
+def parse_chunk(kind, header, lines, mapping, first_line):
+    """ Parse and validate one chunk of lines; runs in a worker process """
+    records, rejects = [], []
+    if kind == "csv":
+        rows = (dict(zip(header, values)) for values in csv.reader(lines))
+    else:
+        rows = (_json_row(line) for line in lines)
+    for line_number, (line, row) in enumerate(zip(lines, rows), first_line):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            records.append(validate(row, mapping))
+        except ValueError as e:
+            rejects.append((line_number, str(e), line.rstrip("\n")))
+    return records, rejects
+
+
+def _json_row(line):
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return ValueError(f"invalid JSON: {e.msg}")
+    return row if isinstance(row, dict) else ValueError("not a JSON object")
+
+
+def read_chunks(path, chunk_lines=CHUNK_LINES):
+    """ Yield (kind, header, lines, first_line_number) chunks of a CSV or JSONL file """
+    kind = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+    with open(path, newline="" if kind == "csv" else None) as f:
+        header = None
+        line_number = 1
+        if kind == "csv":
+            header = next(csv.reader([f.readline()]), [])
+            header = [column.strip() for column in header]
+            line_number = 2
+        chunk = []
+        for line in f:
+            if line.strip():
+                chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield kind, header, chunk, line_number
+                line_number += len(chunk)
+                chunk = []
+        if chunk:
+            yield kind, header, chunk, line_number
+
+
+def build_mapping(pairs):
+    mapping = {field: DEFAULT_COLUMNS.get(field, (field,)) for field in FIELDS}
+    for pair in pairs:
+        field, _, column = pair.partition("=")
+        if field not in FIELDS or not column:
+            raise SystemExit(f"Bad --map {pair!r}; expected one of {', '.join(FIELDS)}=COLUMN")
+        # The named column is tried first; the defaults still cover files that lack it
+        mapping[field] = (column,) + tuple(c for c in mapping[field] if c != column)
+    return mapping
+
+
+def import_files(paths, data_path=DATA_FILE, mapping=None, workers=None, chunk_lines=CHUNK_LINES, rejects_path=None):
+    """ Import the files into the store at data_path; returns (imported, duplicates, rejected) """
+    mapping = mapping or build_mapping([])
+    store = get_store(data_path)
+    # Copies of each record in the history, including the files imported so far
+    stored = Counter(record_key(record) for record in store.query())
+    imported = duplicates = rejected = 0
+
+    rejects_file = open(rejects_path, "w", newline="") if rejects_path else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+    if rejects_writer:
+        rejects_writer.writerow(["file", "line", "reason", "row"])
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path in paths:
+                pending = []
+                # Copies of each record read from this file so far
+                seen = Counter()
+                for kind, header, lines, first_line in read_chunks(path, chunk_lines):
+                    pending.append(pool.submit(parse_chunk, kind, header, lines, mapping, first_line))
+                    # Keep at most two chunks per worker in flight so memory stays bounded
+                    if len(pending) >= workers * 2:
+                        counts = _commit(pending.pop(0).result(), path, store, stored, seen, rejects_writer)
+                        imported, duplicates, rejected = imported + counts[0], duplicates + counts[1], rejected + counts[2]
+                while pending:
+                    counts = _commit(pending.pop(0).result(), path, store, stored, seen, rejects_writer)
+                    imported, duplicates, rejected = imported + counts[0], duplicates + counts[1], rejected + counts[2]
+                for key, count in seen.items():
+                    stored[key] = max(stored[key], count)
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    # One compaction for the whole import instead of one per batch
+    if isinstance(store, JournalStore):
+        store.compact_async()
+        store.wait()
+    return imported, duplicates, rejected
+
+
+def _commit(result, path, store, stored, seen, rejects_writer):
+    records, rejects = result
+    batch = []
+    for record in records:
+        key = record_key(record)
+        seen[key] += 1
+        if seen[key] > stored[key]:
+            batch.append(record)
+    store.append_many(batch, compact=False)
+    if rejects_writer:
+        rejects_writer.writerows([path, line, reason, row] for line, reason, row in rejects)
+    return len(batch), len(records) - len(batch), len(rejects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", help="CSV or JSON-lines files to import")
+    parser.add_argument("--data", default=DATA_FILE, help="data file to import into (default: %(default)s)")
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help="read a Food field from a differently named column")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    parser.add_argument("--rejects", default="rejects.csv", help="where to write rejected rows (default: %(default)s)")
+    args = parser.parse_args()
+
+    imported, duplicates, rejected = import_files(
+        args.files, args.data, build_mapping(args.map), args.workers, args.chunk_lines, args.rejects
+    )
+    print(f"Imported {imported} records, skipped {duplicates} duplicates, rejected {rejected} rows")
+    if rejected:
+        print(f"Rejected rows written to {args.rejects}")
+    return 0 if imported or not rejected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,62 @@
-from dataclasses import dataclass
 
 import numpy as np
 import matplotlib.pyplot as plt
+from dashboard import update_bars, update_pie
+from lod import decimate_line
+from records import Food
+from goals import GOALS, load_goals
 
-while True:
-    CALORIE_LIMIT = int(input("Enter your daily calorie limit (kcal): "))
-    PROTEIN_GOAL = int(input("Enter your daily protein goal (grams): "))
-    FAT_GOAL = int(input("Enter your daily fat goal (grams): "))
-    CARBS_GOAL = int(input("Enter your daily carbs goal (grams): "))
+# Most points drawn on the cumulative calorie line
+MAX_LINE_POINTS = 500
 
-    print(f"Your goals are set as follows:")
-    print(f"Calorie Limit: {CALORIE_LIMIT} kcal")
-    print(f"Protein Goal: {PROTEIN_GOAL} grams")
-    print(f"Fat Goal: {FAT_GOAL} grams")
-    print(f"Carbs Goal: {CARBS_GOAL} grams")
+# Interactive mode keeps the chart window open and responsive between menu prompts
+plt.ion()
 
-    confirmation = input("\nDo you confirm these goals? (yes/no): ").strip().lower()
+def ask_goals():
+    """ Prompt until the user confirms their goals; returns them as a dict """
+    while True:
+        CALORIE_LIMIT = int(input("Enter your daily calorie limit (kcal): "))
+        PROTEIN_GOAL = int(input("Enter your daily protein goal (grams): "))
+        FAT_GOAL = int(input("Enter your daily fat goal (grams): "))
+        CARBS_GOAL = int(input("Enter your daily carbs goal (grams): "))
 
-    if confirmation == "yes":
-            print("\nGoals confirmed!")
-            break
-    else:
-            print("\nPlease re-enter your goals\n")
-    
-today = []
+        print(f"Your goals are set as follows:")
+        print(f"Calorie Limit: {CALORIE_LIMIT} kcal")
+        print(f"Protein Goal: {PROTEIN_GOAL} grams")
+        print(f"Fat Goal: {FAT_GOAL} grams")
+        print(f"Carbs Goal: {CARBS_GOAL} grams")
+
+        confirmation = input("\nDo you confirm these goals? (yes/no): ").strip().lower()
 
+        if confirmation == "yes":
+                print("\nGoals confirmed!")
+                return {"calories": CALORIE_LIMIT, "protein": PROTEIN_GOAL, "fat": FAT_GOAL, "carbs": CARBS_GOAL}
+        else:
+                print("\nPlease re-enter your goals\n")
 
-@dataclass
-class Food:
-    name: str
-    calories: int
-    protein: int
-    fat: int
-    carbs: int 
+# Saved goals are reused; only the first run (or "Change goals") prompts
+goals_profile = load_goals()
+goals = goals_profile.current()
+if goals:
+    print(f"Goals: {goals['calories']} kcal, {goals['protein']} g protein, {goals['fat']} g fat, {goals['carbs']} g carbs")
+else:
+    goals = ask_goals()
+    goals_profile.set(goals)
+CALORIE_LIMIT, PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL = (goals[goal] for goal in GOALS)
+    
+today = []
 
 
 done = False
 
+# Chart window, built on the first "Visualize Data" and updated in place afterwards
+fig = None
+
 while not done:
     print("""
     (1) Add a new food
     (2) Visualize Data
+    (g) Change goals
     (q) Quit
      """)
     
@@ -53,7 +69,7 @@ while not done:
         protein = int(input("Proteins: "))
         fats = int(input("Fats: "))
         carbs = int(input("Carbs: "))
-        food = Food(name, calories, protein, fats, carbs)
+        food = Food.create(name, calories, protein, fats, carbs)
         today.append(food)
         print("Successfully added!")
     elif choice == "2":
@@ -66,28 +82,43 @@ while not done:
         fats_sum = sum(food.fat for food in today)
         carbs_sum = sum(food.carbs for food in today)
 
-        fig, axs = plt.subplots(2, 2) 
-        axs[0, 0].pie(
-            [protein_sum, fats_sum, carbs_sum],
-            labels=["Proteins", "Fats", "Carbs"],
-            autopct="%1.1f%%"
-    )
-        axs[0, 0].set_title("Macronutrients Distribution (Macros)")
-        axs[0, 1].bar([0, 1, 2], [protein_sum, fats_sum, carbs_sum], width=0.4, color='blue', label="Consumed")
-        axs[0, 1].set_xticks([0, 0.5, 1, 1.5, 2, 2.5])
-        axs[0, 1].set_xticklabels(
-            ["Total Protein\nConsumed", "Protein Goal", "Total Fats\nConsumed", "Fat Goal", "Total Carbs\nConsumed", "Carbs Goal"],
-            fontsize=8)
-        axs[0, 1].bar([0.5, 1.5, 2.5], [PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL], width=0.4, color='orange', label="Goal")
-        axs[0, 1].set_title("Macronutrient Progress")
-        axs[1, 0].pie([calorie_sum, CALORIE_LIMIT - calorie_sum], labels=["Calories", "Remaining"], autopct="%1.1f%%")
-        axs[1, 0].set_title("Calorie Goal Progress")
-        axs[1, 1].plot(list(range(len(today))), np.cumsum([food.calories for food in today]), label="Calories Eaten")
-        axs[1, 1].plot(list(range(len(today))), [CALORIE_LIMIT] * len(today), label="Calorie Goal")
-        axs[1, 1].legend()
-        axs[1, 1].set_title("Calorie Consumption Over Time")
-        fig.tight_layout()
+        if fig is None or not plt.fignum_exists(fig.number):
+            fig, axs = plt.subplots(2, 2)
+            macro_pie = axs[0, 0].pie([1, 1, 1], labels=["Proteins", "Fats", "Carbs"], autopct="%1.1f%%")
+            axs[0, 0].set_title("Macronutrients Distribution (Macros)")
+            consumed_bars = axs[0, 1].bar([0, 1, 2], [0, 0, 0], width=0.4, color='blue', label="Consumed")
+            axs[0, 1].set_xticks([0, 0.5, 1, 1.5, 2, 2.5])
+            axs[0, 1].set_xticklabels(
+                ["Total Protein\nConsumed", "Protein Goal", "Total Fats\nConsumed", "Fat Goal", "Total Carbs\nConsumed", "Carbs Goal"],
+                fontsize=8)
+            axs[0, 1].bar([0.5, 1.5, 2.5], [PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL], width=0.4, color='orange', label="Goal")
+            axs[0, 1].set_title("Macronutrient Progress")
+            calorie_pie = axs[1, 0].pie([1, 1], labels=["Calories", "Remaining"], autopct="%1.1f%%")
+            axs[1, 0].set_title("Calorie Goal Progress")
+            eaten_line, = axs[1, 1].plot([], [], label="Calories Eaten")
+            goal_line, = axs[1, 1].plot([], [], label="Calorie Goal")
+            axs[1, 1].legend()
+            axs[1, 1].set_title("Calorie Consumption Over Time")
+            fig.tight_layout()
+
+        update_pie(macro_pie, [protein_sum, fats_sum, carbs_sum])
+        update_bars(consumed_bars, [protein_sum, fats_sum, carbs_sum])
+        update_pie(calorie_pie, [calorie_sum, CALORIE_LIMIT - calorie_sum])
+        eaten_line.set_data(*decimate_line(np.arange(len(today)), np.cumsum([food.calories for food in today]), MAX_LINE_POINTS))
+        goal_line.set_data([0, max(len(today) - 1, 0)], [CALORIE_LIMIT, CALORIE_LIMIT])
+        for ax in (axs[0, 1], axs[1, 1]):
+            ax.relim()
+            ax.autoscale_view()
+        fig.canvas.draw_idle()
         plt.show()
+    elif choice == "g":
+        goals = ask_goals()
+        goals_profile.set(goals)
+        CALORIE_LIMIT, PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL = (goals[goal] for goal in GOALS)
+        # The goal bars are drawn once with the figure; rebuild it with the new goals
+        if fig is not None:
+            plt.close(fig)
+            fig = None
     elif choice == "q":
         done = True
     else:
@@ -1,46 +1,63 @@
-from dataclasses import dataclass
+import os
+import threading
 import tkinter as tk
+from collections import Counter
 from tkinter import messagebox
-import json
-import numpy as np
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
-# Load saved data
-DATA_FILE = "data.json"
-def load_data():
-    try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
-
-data = load_data()
-
-# Define the Food class
-@dataclass
-class Food:
-    name: str
-    calories: int
-    protein: int
-    fat: int
-    carbs: int
-    date: str
+from storage import CorruptDataError, WriteBehind, get_store
+from tasks import TaskScheduler
+from records import Food, day_number, today
+from goals import GoalsProfile, load_goals
+import instrument
+from instrument import span
+
+# numpy, matplotlib and reportlab are imported on first use (or by the
+# prewarm thread) so the goals page appears after loading only tkinter
+
+# Optional nutrition table (name, calories, protein, fat, carbs) merged into the food catalog
+NUTRITION_FILE = "foods.csv"
+
+# Days of moving averages drawn in the trends panel
+TREND_DAYS = 180
+
+# How often the data file is checked for foods added by other instances
+WATCH_MS = 1000
 
 class CalorieTrackerApp:
-    def __init__(self, root):
+    def __init__(self, root, prewarm=True):
         self.root = root
         self.root.title("Calorie Tracker")
         self.root.geometry("500x600")
         self.root.configure(bg="black")
 
-        self.data = load_data()
+        # Saved data is loaded once, on first use
+        self._data = None
+        self._rollups = None
+        self._data_lock = threading.Lock()
+
+        # Saving, aggregation and PDF export run here, off the Tk thread
+        self.tasks = TaskScheduler(self.root)
+        self.status = tk.StringVar()
+        # New foods are buffered and written in batches after a short pause, and on close
+        self.writer = WriteBehind(get_store(), on_flush=self.foods_saved, on_error=self.save_failed)
+
+        # Foods other instances add are picked up from the data file and merged in
+        self.data_cursor = None
+        self.watching = True
+        self.root.after(WATCH_MS, self.watch)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Graph window, created on the first "Generate Graphs"
+        self.graph_window = None
+        self.dashboard = None
+        self.trends = None
+        self.graph_request = None
+
+        # Goal analytics, built from the daily rollups on first use and then kept current
+        self.analytics = None
+
+        # Meal planner over the catalog, rebuilt when the catalog changes
+        self.planner = None
+        self.plans = []
 
         # Goals variables
         self.calorie_limit = tk.IntVar()
@@ -48,7 +65,90 @@ class CalorieTrackerApp:
         self.fat_goal = tk.IntVar()
         self.carbs_goal = tk.IntVar()
 
-        self.setup_goals_page()
+        # Saved goals skip the goals page; "Edit Goals" brings it back
+        try:
+            self.goals_profile = load_goals()
+        except ValueError as e:
+            messagebox.showerror("Goals Error", f"{e}\nPlease enter your goals again.")
+            self.goals_profile = GoalsProfile()
+        current = self.goals_profile.current()
+        if current:
+            self.use_goals(current)
+            self.show_food_page()
+        else:
+            self.setup_goals_page()
+
+        # Timings panel, only when instrumentation is switched on (CALORIE_TRACKER_TRACE)
+        self.debug_panel = instrument.DebugPanel(self.root) if instrument.enabled else None
+
+        # Load the history and the heavy modules while the user types their goals
+        if prewarm:
+            threading.Thread(target=self.prewarm, daemon=True).start()
+
+    @property
+    def data(self):
+        with self._data_lock:
+            if self._data is None:
+                from catalog import FoodCatalog
+                from foodlog import load_log
+                from rollups import load_rollups
+
+                with span("data.load"):
+                    with span("storage.load"):
+                        self._data = load_log()
+                        self.data_cursor = get_store().cursor()
+                    with span("rollups.load"):
+                        self._rollups = load_rollups(self._data)
+                    with span("catalog.build"):
+                        self._catalog = FoodCatalog.from_log(self._data)
+                        if os.path.exists(NUTRITION_FILE):
+                            self._catalog.import_csv(NUTRITION_FILE)
+            return self._data
+
+    @property
+    def rollups(self):
+        self.data
+        return self._rollups
+
+    @property
+    def catalog(self):
+        self.data
+        return self._catalog
+
+    def prewarm(self):
+        """ Load saved data and import the plotting and PDF modules in the background """
+        try:
+            self.data
+        except CorruptDataError as e:
+            self.tasks.post(self.data_failed, e)
+            return
+        import matplotlib.backends.backend_tkagg  # noqa: F401
+        import reportlab.pdfgen.canvas  # noqa: F401
+
+    def close(self):
+        # Write buffered foods and let queued saves finish before the window goes away
+        try:
+            self.writer.close()
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Your latest foods could not be saved:\n{e}")
+        self.tasks.shutdown()
+        self.root.destroy()
+
+    def data_failed(self, error):
+        # Nothing is written over a damaged file; the user restores or moves it first
+        messagebox.showerror(
+            "Data Error",
+            f"{error}\n\nYour food history could not be loaded and was left untouched. "
+            "Restore it from a backup, or move it aside to start a new history.",
+        )
+        self.close()
+
+    def set_status(self, text):
+        self.status.set(text)
+
+    def task_failed(self, error):
+        self.set_status("")
+        messagebox.showerror("Error", str(error))
 
     def setup_goals_page(self):
         # Hide any previous widgets
@@ -81,10 +181,32 @@ class CalorieTrackerApp:
             messagebox.showerror("Input Error", "Please enter all goal values.")
             return
 
+        # Saved as a new version from today; earlier days keep the goals they had
+        try:
+            self.goals_profile.set(self.goals())
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Could not save goals: {e}")
+        if self.analytics is not None:
+            self.tasks.submit(lambda task: self.analytics.set_goals(self.goals_profile), serial=True,
+                              on_error=self.task_failed)
+
         messagebox.showinfo("Goals Set", f"Goals set successfully!\n\nCalorie Limit: {self.calorie_limit_value} kcal\nProtein Goal: {self.protein_goal_value} g\nFat Goal: {self.fat_goal_value} g\nCarbs Goal: {self.carbs_goal_value} g")
 
         self.show_food_page()
 
+    def use_goals(self, goals):
+        for var, goal in ((self.calorie_limit, "calories"), (self.protein_goal, "protein"),
+                          (self.fat_goal, "fat"), (self.carbs_goal, "carbs")):
+            var.set(round(goals[goal]))
+        self.calorie_limit_value = self.calorie_limit.get()
+        self.protein_goal_value = self.protein_goal.get()
+        self.fat_goal_value = self.fat_goal.get()
+        self.carbs_goal_value = self.carbs_goal.get()
+
+    def goals(self):
+        return {"calories": self.calorie_limit_value, "protein": self.protein_goal_value,
+                "fat": self.fat_goal_value, "carbs": self.carbs_goal_value}
+
     def show_food_page(self):
         # Hide any previous widgets
         for widget in self.root.winfo_children():
@@ -95,6 +217,12 @@ class CalorieTrackerApp:
         tk.Label(self.root, text="Food Name:", font=("Arial", 12), fg="white", bg="black").grid(row=1, column=0)
         self.food_name_entry = tk.Entry(self.root, font=("Arial", 12))
         self.food_name_entry.grid(row=1, column=1)
+        self.food_name_entry.bind("<KeyRelease>", self.suggest_foods)
+
+        # Autocomplete dropdown shown under the name entry while typing
+        self.suggestions = tk.Listbox(self.root, font=("Arial", 11), height=6)
+        self.suggestions.bind("<<ListboxSelect>>", self.pick_suggestion)
+        self.suggested_foods = []
 
         tk.Label(self.root, text="Calories:", font=("Arial", 12), fg="white", bg="black").grid(row=2, column=0)
         self.food_calories_entry = tk.Entry(self.root, font=("Arial", 12))
@@ -118,6 +246,97 @@ class CalorieTrackerApp:
 
         tk.Button(self.root, text="Export to PDF", font=("Arial", 12), fg="black", bg="white", command=self.export_to_pdf).grid(row=8, column=0, columnspan=2, pady=20)
 
+        tk.Button(self.root, text="Plan Rest of Day", font=("Arial", 12), fg="black", bg="white", command=self.plan_day).grid(row=15, column=0, columnspan=2)
+
+        # Planner results, shown once a plan has been asked for; picking one fills in its first food.
+        # Rows 9-12 belong to the graph controls and 13-14 to the status line and Edit Goals
+        self.plan_list = tk.Listbox(self.root, font=("Arial", 10), height=5, width=60)
+        self.plan_list.bind("<<ListboxSelect>>", self.pick_plan)
+
+        tk.Label(self.root, textvariable=self.status, font=("Arial", 10), fg="white", bg="black").grid(row=13, column=0, columnspan=2)
+
+        tk.Button(self.root, text="Edit Goals", font=("Arial", 10), fg="black", bg="white", command=self.setup_goals_page).grid(row=14, column=0, columnspan=2, pady=10)
+
+    def suggest_foods(self, event):
+        text = self.food_name_entry.get()
+        if event.keysym in ("Escape", "Return") or not text.strip():
+            self.suggestions.place_forget()
+            return
+
+        self.suggested_foods = self.catalog.suggest(text, limit=6)
+        if not self.suggested_foods:
+            self.suggestions.place_forget()
+            return
+
+        self.suggestions.delete(0, tk.END)
+        for food in self.suggested_foods:
+            self.suggestions.insert(tk.END, f"{food['name']} ({food['calories']} kcal)")
+        self.suggestions.configure(height=len(self.suggested_foods))
+        self.suggestions.place(in_=self.food_name_entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggestions.lift()
+
+    def pick_suggestion(self, event):
+        selection = self.suggestions.curselection()
+        if not selection:
+            return
+        self.fill_food(self.suggested_foods[selection[0]])
+        self.suggestions.place_forget()
+
+    def fill_food(self, food):
+        # Fill in the name and the macros last logged for it (whole numbers, as add_food expects)
+        for entry, value in ((self.food_name_entry, food["name"]), (self.food_calories_entry, food["calories"]),
+                             (self.food_protein_entry, food["protein"]), (self.food_fat_entry, food["fat"]),
+                             (self.food_carbs_entry, food["carbs"])):
+            entry.delete(0, tk.END)
+            entry.insert(0, round(value) if isinstance(value, float) else value)
+
+    def plan_day(self):
+        """ Rank combinations of known foods that fill what is left of today's goals """
+        day = today()
+        eaten = self.data.slice_by_date(day, day).sum()
+        # The worker gets its own copy of the entries; the catalog keeps changing on this thread.
+        # Keyed on the catalog object too: a reloaded catalog counts its versions from zero again
+        catalog_key = (self.catalog, self.catalog.version)
+        planner = foods = None
+        if self.planner is not None and self.planner[0] == catalog_key:
+            planner = self.planner[1]
+        else:
+            foods = list(self.catalog.entries.values())
+        self.set_status("Planning...")
+        self.tasks.submit(self.find_plans, planner, foods, catalog_key, eaten, self.goals(), key="plan",
+                          on_done=self.show_plans, on_error=self.task_failed)
+
+    def find_plans(self, task, planner, foods, catalog_key, eaten, goals):
+        from planner import Planner
+
+        if planner is None:
+            with span("planner.build"):
+                planner = Planner(foods)
+            self.planner = (catalog_key, planner)
+        with span("planner.plan"):
+            return planner.plan(eaten, goals)
+
+    def show_plans(self, plans):
+        self.plans = plans
+        self.plan_list.delete(0, tk.END)
+        if not plans:
+            self.plan_list.grid_forget()
+            self.set_status("No combination of known foods fits what is left of today's goals.")
+            return
+        self.set_status("")
+        for plan in plans:
+            counts = Counter(food["name"] for food in plan["foods"])
+            names = " + ".join(name if n == 1 else f"{n} x {name}" for name, n in counts.items())
+            totals = plan["totals"]
+            self.plan_list.insert(tk.END, f"{names}: {totals['calories']:.0f} kcal, {totals['protein']:.0f}g protein, "
+                                          f"{totals['fat']:.0f}g fat, {totals['carbs']:.0f}g carbs")
+        self.plan_list.grid(row=16, column=0, columnspan=2, pady=5)
+
+    def pick_plan(self, event):
+        selection = self.plan_list.curselection()
+        if selection:
+            self.fill_food(self.plans[selection[0]]["foods"][0])
+
     def add_food(self):
         name = self.food_name_entry.get()
         calories = self.food_calories_entry.get()
@@ -139,14 +358,83 @@ class CalorieTrackerApp:
             messagebox.showerror("Input Error", "Please enter valid numbers for calories, protein, fat, and carbs.")
             return
 
-        date = datetime.today().strftime('%Y-%m-%d')
-
-        food = Food(name, calories, protein, fat, carbs, date)
-        self.data.append(food.__dict__)
-        save_data(self.data)
+        # Stamped with the zoned time and dated by the tracking day it falls in
+        food = Food.create(name, calories, protein, fat, carbs)
+        self.data.append(food)
+        # Stored and indexed as a plain record dict
+        record = food.to_dict()
+        self.catalog.add(record)
+        self.writer.append(record)
+        # Queued ahead of the graph refresh, which reads the rollups on the same worker
+        self.tasks.submit(self.add_to_rollups, [record], serial=True, on_error=self.task_failed)
+        if self.dashboard is not None:
+            self.refresh_graphs()
 
         messagebox.showinfo("Food Added", f"Food added successfully!\n\n{name} - {calories} kcal")
 
+    def foods_saved(self, foods):
+        # Runs on the writer's thread once a batch is on disk; the rollups file follows it
+        self.tasks.submit(self.save_rollups, serial=True, on_error=self.task_failed)
+
+    def save_failed(self, error):
+        # The foods stay buffered and are retried on the next flush
+        self.tasks.post(self.task_failed, error)
+
+    def add_to_rollups(self, task, foods):
+        with span("rollups.add"):
+            for food in foods:
+                self.rollups.add(food)
+        if self.analytics is not None:
+            for food in foods:
+                self.analytics.add(food)
+
+    def save_rollups(self, task):
+        with span("rollups.save"):
+            self.rollups.save()
+
+    def watch(self):
+        """ Poll the data file for foods other instances (the CLI, another window) added """
+        if self._data is not None and not self.tasks.busy("watch"):
+            self.tasks.submit(self.read_changes, key="watch", on_done=self.merge_changes, on_error=self.watch_failed)
+        if self.watching:
+            self.root.after(WATCH_MS, self.watch)
+
+    def read_changes(self, task):
+        return get_store().read_new(self.data_cursor)
+
+    def merge_changes(self, result):
+        records, self.data_cursor = result
+        if records is None:
+            # Rewritten elsewhere: drop everything loaded and load it again in the background
+            with self._data_lock:
+                self._data = self._rollups = None
+            self.analytics = self.planner = None
+            self.set_status("The data file was replaced; reloading...")
+            self.tasks.submit(self.reload_data, on_done=self.data_reloaded, on_error=self.data_failed)
+            return
+        if not records:
+            return
+        self.data.extend(Food.from_dict(record) for record in records)
+        for record in records:
+            self.catalog.add(record)
+        self.tasks.submit(self.add_to_rollups, records, serial=True, on_error=self.task_failed)
+        self.tasks.submit(self.save_rollups, serial=True, on_error=self.task_failed)
+        self.set_status(f"{len(records)} food(s) added elsewhere")
+        if self.dashboard is not None:
+            self.refresh_graphs()
+
+    def reload_data(self, task):
+        self.data
+
+    def data_reloaded(self, result):
+        self.set_status("")
+        if self.dashboard is not None:
+            self.refresh_graphs()
+
+    def watch_failed(self, error):
+        self.watching = False
+        self.task_failed(error)
+
     def visualize_data(self):
         if not self.data:
             messagebox.showerror("No Data", "No food data to visualize.")
@@ -178,6 +466,7 @@ class CalorieTrackerApp:
 
     def plot_time_period_graphs(self):
         time_period = self.time_period_var.get()
+        start_date = end_date = None
 
         # If Custom is selected, use the custom date range
         if time_period == "Custom":
@@ -185,108 +474,137 @@ class CalorieTrackerApp:
             end_date = self.end_date_entry.get()
 
             try:
-                start_date = datetime.strptime(start_date, "%Y-%m-%d")
-                end_date = datetime.strptime(end_date, "%Y-%m-%d")
+                start_date = day_number(start_date)
+                end_date = day_number(end_date)
             except ValueError:
                 messagebox.showerror("Invalid Date", "Please enter valid dates in the format YYYY-MM-DD.")
                 return
 
-            filtered_data = [f for f in self.data if start_date <= datetime.strptime(f['date'], "%Y-%m-%d") <= end_date]
+        self.graph_request = (time_period, start_date, end_date)
+        self.refresh_graphs()
+
+    def refresh_graphs(self):
+        # Aggregate on a worker; rollups are read on the serial worker that updates them.
+        # A newer request replaces a pending one.
+        time_period, start_date, end_date = self.graph_request
+        width_px = self.dashboard.plot_width() if self.dashboard is not None else 400
+        rows = None
+        if time_period == "Custom":
+            # Copied here: slices are views of the live log, which this thread reorders as foods are added
+            with span("graphs.filter"):
+                rows = self.data.slice_by_date(start_date, end_date).copy()
+        self.set_status("Building graphs...")
+        instrument.count("graphs.requests")
+        self.tasks.submit(self.summarize_period, time_period, rows, width_px, key="graphs",
+                          serial=time_period != "Custom", on_done=self.draw_graphs, on_error=self.task_failed)
+
+    def summarize_period(self, task, time_period, rows, width_px):
+        with span("graphs.summarize"):
+            return self._summarize_period(task, time_period, rows, width_px)
+
+    def _summarize_period(self, task, time_period, rows, width_px):
+        from foodlog import aggregate
+
+        if time_period == "Daily":
+            # Served from the precomputed level-of-detail pyramid over the daily rollups
+            with span("graphs.lod"):
+                pyramid = self.rollups.pyramid()
+                return pyramid.query(width_px) if len(pyramid) else None
+
+        if time_period == "Custom":
+            filtered_data = rows
         else:
             # Group data by the selected period (daily, weekly, monthly)
-            filtered_data = self.group_data_by_period(time_period)
+            with span("graphs.group"):
+                filtered_data = self.group_data_by_period(time_period)
 
-        if not filtered_data:
+        task.check_cancelled()
+        with span("graphs.aggregate"):
+            return aggregate(filtered_data) if filtered_data else None
+
+    def draw_graphs(self, summary):
+        self.set_status("")
+        if summary is None:
             messagebox.showerror("No Data", "No food data available for the selected period.")
             return
 
-        # Generate the 4 graphs as per your original code
-        fig, axs = plt.subplots(2, 2)
-
-        # Total Calories vs Time
-        datewise_calories = {}
-        for food in filtered_data:
-            datewise_calories[food['date']] = datewise_calories.get(food['date'], 0) + food['calories']
-
-        dates = list(datewise_calories.keys())
-        calories = list(datewise_calories.values())
-        axs[0, 0].bar(dates, calories)
-        axs[0, 0].set_title('Total Calories')
-
-        # Protein, Fat, Carbs Distribution Pie Chart
-        total_protein = sum(f['protein'] for f in filtered_data)
-        total_fat = sum(f['fat'] for f in filtered_data)
-        total_carbs = sum(f['carbs'] for f in filtered_data)
-        axs[0, 1].pie([total_protein, total_fat, total_carbs], labels=["Protein", "Fat", "Carbs"], autopct='%1.1f%%')
-        axs[0, 1].set_title('Macronutrient Distribution')
-
-        # Total Protein vs Time
-        datewise_protein = {}
-        for food in filtered_data:
-            datewise_protein[food['date']] = datewise_protein.get(food['date'], 0) + food['protein']
-
-        protein_dates = list(datewise_protein.keys())
-        protein_values = list(datewise_protein.values())
-        axs[1, 0].bar(protein_dates, protein_values)
-        axs[1, 0].set_title('Protein Intake')
-
-        # Total Fat vs Time
-        datewise_fat = {}
-        for food in filtered_data:
-            datewise_fat[food['date']] = datewise_fat.get(food['date'], 0) + food['fat']
-
-        fat_dates = list(datewise_fat.keys())
-        fat_values = list(datewise_fat.values())
-        axs[1, 1].bar(fat_dates, fat_values)
-        axs[1, 1].set_title('Fat Intake')
-
-        plt.show()
+        # Build the dashboard window once; later requests update its charts in place
+        if self.dashboard is None:
+            with span("graphs.figure"):
+                from dashboard import Dashboard
+
+                self.graph_window = tk.Toplevel(self.root)
+                self.graph_window.title("Calorie Tracker Graphs")
+                self.graph_window.protocol("WM_DELETE_WINDOW", self.close_graphs)
+                self.dashboard = Dashboard(self.graph_window, rotate_dates=True)
+                self.dashboard.widget().pack(fill=tk.BOTH, expand=True)
+
+        with span("graphs.draw"):
+            self.dashboard.update(summary)
+        self.refresh_trends()
+
+    def refresh_trends(self):
+        # Analytics are read and updated on the serial worker, next to the rollups they come from
+        self.tasks.submit(self.summarize_trends, self.goals_profile, key="trends", serial=True,
+                          on_done=self.draw_trends, on_error=self.task_failed)
+
+    def summarize_trends(self, task, goals):
+        from analytics import GoalAnalytics
+
+        with span("trends.summarize"):
+            if self.analytics is None:
+                self.analytics = GoalAnalytics.from_rollups(self.rollups.tables["Daily"], goals)
+            series = {window: self.analytics.series(window, days=TREND_DAYS) for window in self.analytics.windows}
+            return self.analytics.summary(), series, goals.current()["calories"]
+
+    def draw_trends(self, result):
+        if self.graph_window is None:
+            return
+        summary, series, limit = result
+        if self.trends is None:
+            from dashboard import TrendsPanel
+
+            self.trends = TrendsPanel(self.graph_window, list(series))
+            self.trends.widget().pack(fill=tk.BOTH, expand=True)
+        with span("trends.draw"):
+            self.trends.update(summary, series, limit)
+
+    def close_graphs(self):
+        self.dashboard.destroy()
+        if self.trends is not None:
+            self.trends.destroy()
+        self.graph_window.destroy()
+        self.dashboard = None
+        self.trends = None
+        self.graph_window = None
+        self.tasks.cancel("graphs")
+        self.tasks.cancel("trends")
 
     def group_data_by_period(self, time_period):
         """ Group data by the selected time period (daily, weekly, monthly) """
-        grouped_data = {}
-
-        for food in self.data:
-            food_date = datetime.strptime(food['date'], "%Y-%m-%d")
-
-            # Group by daily
-            if time_period == "Daily":
-                key = food_date.date()
-
-            # Group by weekly
-            elif time_period == "Weekly":
-                start_of_week = food_date - timedelta(days=food_date.weekday())
-                key = start_of_week.date()
-
-            # Group by monthly
-            elif time_period == "Monthly":
-                key = food_date.replace(day=1).date()
-
-            # Update grouped data
-            if key not in grouped_data:
-                grouped_data[key] = {"calories": 0, "protein": 0, "fat": 0, "carbs": 0}
-            
-            grouped_data[key]["calories"] += food['calories']
-            grouped_data[key]["protein"] += food['protein']
-            grouped_data[key]["fat"] += food['fat']
-            grouped_data[key]["carbs"] += food['carbs']
-
-        # Convert grouped data to a list
-        return [{"date": str(date), "calories": values["calories"], "protein": values["protein"], 
-                "fat": values["fat"], "carbs": values["carbs"]} for date, values in grouped_data.items()]
+        return self.rollups.grouped(time_period)
 
     def export_to_pdf(self):
-        c = canvas.Canvas("calorie_tracker.pdf", pagesize=letter)
-        c.drawString(100, 750, "Calorie Tracker Report")
+        from report import write_report
+
+        # Streamed on a worker from a copy of the date-sorted log, so foods added meanwhile don't shift its rows
+        # and the JSON store never has to load the whole history as dicts; a second click restarts the export
+        log = self.data.copy()
 
-        for i, food in enumerate(self.data):
-            c.drawString(100, 730 - i * 20, f"Food: {food['name']}, Calories: {food['calories']}, Date: {food['date']}")
+        def run(task):
+            with span("pdf.write"):
+                return write_report(log, "calorie_tracker.pdf", progress=task.progress, cancelled=task.cancelled)
 
-        c.save()
+        self.set_status("Exporting PDF...")
+        self.tasks.submit(run, key="pdf", on_done=self.pdf_exported, on_error=self.task_failed,
+                          on_progress=lambda rows: self.set_status(f"Exporting PDF... {rows} records"))
 
+    def pdf_exported(self, rows):
+        self.set_status("")
         messagebox.showinfo("Export to PDF", "PDF generated successfully!")
 
 # Run the app
-root = tk.Tk()
-app = CalorieTrackerApp(root)
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = CalorieTrackerApp(root)
+    root.mainloop()
@@ -0,0 +1,164 @@
+import csv
+from bisect import bisect_left, insort
+from collections import Counter
+
+import numpy as np
+
+from records import MACROS
+
+# How many prefix matches are ranked per lookup; keeps one-letter prefixes fast
+PREFIX_SCAN_LIMIT = 200
+
+# Candidates verified with edit distance per fuzzy lookup
+FUZZY_CANDIDATES = 64
+
+# Trigrams shared by more names than this are too common to narrow a fuzzy search
+MAX_POSTING = 5000
+
+
+def normalize(name):
+    return " ".join(str(name).lower().split())
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """ Levenshtein distance between a and b, or limit + 1 once it is known to exceed limit """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FoodCatalog:
+    """ Searchable table of known foods and their macros.
+
+    Built from the food history (the latest macros logged for each name)
+    plus any imported nutrition table. Names are kept in a sorted key list
+    for prefix lookups with ``bisect`` and in a trigram index for
+    typo-tolerant lookups. Both indexes are updated incrementally by
+    ``add``, so the catalog never needs a full rebuild.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._keys = []
+        self._trigrams = {}
+        # Bumped on every change, so derived tables (the planner's matrix) know to rebuild
+        self.version = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_log(cls, log):
+        """ Build a catalog from a FoodLog, keeping each name's most recent macros """
+        catalog = cls()
+        codes = log.name_codes
+        if not len(codes):
+            return catalog
+        # First occurrence in the reversed log is each name's latest entry
+        _, first, counts = np.unique(codes[::-1], return_index=True, return_counts=True)
+        catalog.add_many(
+            (log.record(int(i)), int(count)) for i, count in zip(len(codes) - 1 - first, counts)
+        )
+        return catalog
+
+    def add(self, food, count=1):
+        """ Add or refresh a food; the latest macros win and the use count grows """
+        key = self._add(food, count)
+        if key is not None:
+            insort(self._keys, key)
+
+    def add_many(self, foods):
+        """ Add (food, count) pairs, re-sorting the key list once at the end """
+        new_keys = [key for key in (self._add(food, count) for food, count in foods) if key is not None]
+        if new_keys:
+            self._keys.extend(new_keys)
+            self._keys.sort()
+        return len(new_keys)
+
+    def _add(self, food, count):
+        """ Update an entry, returning its key if it is new and still needs a place in _keys """
+        key = normalize(food["name"])
+        if not key:
+            return None
+        self.version += 1
+        entry = self.entries.get(key)
+        new = entry is None
+        if new:
+            entry = {"name": food["name"], "count": 0}
+            self.entries[key] = entry
+            for gram in trigrams(key):
+                self._trigrams.setdefault(gram, []).append(key)
+        for macro in MACROS:
+            entry[macro] = food.get(macro, 0)
+        entry["count"] += count
+        return key if new else None
+
+    def import_csv(self, path):
+        """ Import a nutrition table with name, calories, protein, fat and carbs columns """
+        def rows():
+            with open(path, newline="") as f:
+                for row in csv.DictReader(f):
+                    try:
+                        food = {"name": row["name"], **{macro: float(row[macro]) for macro in MACROS}}
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    # Logged foods keep the macros the user actually entered
+                    if normalize(food["name"]) not in self.entries:
+                        yield food, 0
+
+        return self.add_many(rows())
+
+    def get(self, name):
+        return self.entries.get(normalize(name))
+
+    def prefix(self, text, limit=8):
+        """ Return up to limit entries whose name starts with text, most used first """
+        key = normalize(text)
+        start = bisect_left(self._keys, key)
+        matches = []
+        for candidate in self._keys[start:start + PREFIX_SCAN_LIMIT]:
+            if not candidate.startswith(key):
+                break
+            matches.append(self.entries[candidate])
+        matches.sort(key=lambda entry: -entry["count"])
+        return matches[:limit]
+
+    def fuzzy(self, text, limit=8, max_distance=2):
+        """ Return up to limit entries within max_distance edits of text, closest first """
+        key = normalize(text)
+        if not key:
+            return []
+        # Names sharing the most trigrams with the query are verified with edit distance
+        shared = Counter()
+        for gram in trigrams(key):
+            posting = self._trigrams.get(gram, ())
+            if len(posting) <= MAX_POSTING:
+                shared.update(posting)
+        scored = []
+        for candidate, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = edit_distance(key, candidate[:len(key)] if len(candidate) > len(key) else candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, -self.entries[candidate]["count"], candidate))
+        scored.sort()
+        return [self.entries[candidate] for _, _, candidate in scored[:limit]]
+
+    def suggest(self, text, limit=8):
+        """ Prefix matches first, topped up with typo-tolerant matches """
+        matches = self.prefix(text, limit)
+        if len(matches) < limit:
+            names = {id(entry) for entry in matches}
+            matches += [entry for entry in self.fuzzy(text, limit) if id(entry) not in names]
+        return matches[:limit]
@@ -0,0 +1,240 @@
+import numpy as np
+
+from lod import reduce_summary
+
+# Most date labels shown under a bar chart
+MAX_TICK_LABELS = 12
+
+
+def update_pie(pie, values):
+    """ Move the wedges, labels and percentages of an existing ``ax.pie`` result to new values.
+
+    ``pie`` is the ``(wedges, texts, autotexts)`` tuple returned by
+    ``ax.pie(..., autopct=...)`` with the default start angle, radius and
+    label distances. Negative values are drawn as empty wedges.
+    """
+    wedges, texts, autotexts = pie
+    values = np.clip(np.asarray(values, dtype=float), 0, None)
+    total = values.sum()
+    fractions = values / total if total > 0 else np.zeros_like(values)
+
+    theta1 = 0.0
+    for wedge, text, autotext, fraction in zip(wedges, texts, autotexts, fractions):
+        theta2 = theta1 + 360.0 * fraction
+        wedge.set_theta1(theta1)
+        wedge.set_theta2(theta2)
+        middle = np.deg2rad((theta1 + theta2) / 2)
+        x, y = np.cos(middle), np.sin(middle)
+        text.set_position((1.1 * x, 1.1 * y))
+        text.set_horizontalalignment("left" if x > 0 else "right")
+        autotext.set_position((0.6 * x, 0.6 * y))
+        autotext.set_text(f"{100 * fraction:.1f}%")
+        theta1 = theta2
+
+
+def update_bars(bars, heights):
+    """ Set the heights of an existing bar container in place """
+    for rect, height in zip(bars, heights):
+        rect.set_height(height)
+
+
+class Dashboard:
+    """ Embedded four-panel chart (calories, macro split, protein, fat) for a Tk window.
+
+    The figure, axes and canvas are built once. ``update(summary)`` takes
+    the dict returned by ``foodlog.aggregate`` (downsampled here to a bucket
+    size that fits the plot width) or an already downsampled
+    ``lod.Pyramid.query`` result. Bars show the mean per bucket and
+    whiskers its min/max. When the buckets are unchanged
+    and the new values fit the current axes, only the bars and pie are
+    repainted over a cached background (blitting); otherwise the bar
+    containers are replaced and the canvas is redrawn. ``destroy`` releases
+    the widget and the figure.
+    """
+
+    # Axes position, summary key and title of each bar panel
+    PANELS = (((0, 0), "calories", "Total Calories"), ((1, 0), "protein", "Protein Intake"), ((1, 1), "fat", "Fat Intake"))
+
+    def __init__(self, master, figsize=(8, 6), rotate_dates=False):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=figsize)
+        self.axs = self.figure.subplots(2, 2)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.rotate_dates = rotate_dates
+
+        for pos, _, title in self.PANELS:
+            self.axs[pos].set_title(title)
+        self.axs[0, 1].set_title("Macronutrient Distribution")
+        self.pie = self.axs[0, 1].pie([1, 1, 1], labels=["Protein", "Fat", "Carbs"], autopct="%1.1f%%")
+
+        self.bars = {}
+        self.whiskers = {}
+        self.level = None
+        self.dates = None
+        self._background = None
+        for artist in self._animated():
+            artist.set_animated(True)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def widget(self):
+        return self.canvas.get_tk_widget()
+
+    def plot_width(self):
+        """ Approximate pixel width of one bar panel """
+        width = self.canvas.get_tk_widget().winfo_width()
+        if width <= 1:
+            width = self.figure.get_figwidth() * self.figure.dpi
+        return width / 2
+
+    def update(self, summary):
+        series = summary if "level" in summary else reduce_summary(summary, self.plot_width())
+        dates = [str(date) for date in series["dates"]]
+        totals = summary["totals"]
+        update_pie(self.pie, [totals["protein"], totals["fat"], totals["carbs"]])
+
+        if dates == self.dates and series["level"] == self.level and self._fits(series):
+            # Same bars with new heights: repaint only the animated artists
+            for _, macro, _ in self.PANELS:
+                update_bars(self.bars[macro], series["mean"][macro])
+                self.whiskers[macro].set_segments(self._whisker_segments(series, macro))
+            self._blit()
+        else:
+            self._rebuild_bars(dates, series)
+            self.canvas.draw_idle()
+        self.dates = dates
+        self.level = series["level"]
+
+    def destroy(self):
+        self.canvas.get_tk_widget().destroy()
+        self.figure.clear()
+        self.bars = {}
+        self.whiskers = {}
+        self._background = None
+
+    def _animated(self):
+        wedges, texts, autotexts = self.pie
+        artists = [*wedges, *texts, *autotexts]
+        for bars in self.bars.values():
+            artists.extend(bars)
+        artists.extend(self.whiskers.values())
+        return artists
+
+    def _fits(self, series):
+        for pos, macro, _ in self.PANELS:
+            values = series["max"][macro]
+            if len(values) and max(values) > self.axs[pos].get_ylim()[1]:
+                return False
+        return True
+
+    @staticmethod
+    def _whisker_segments(series, macro):
+        x = np.arange(len(series["dates"]))
+        return [[(i, low), (i, high)] for i, low, high in zip(x, series["min"][macro], series["max"][macro])]
+
+    def _rebuild_bars(self, dates, series):
+        from matplotlib.collections import LineCollection
+
+        x = np.arange(len(dates))
+        # Label at most MAX_TICK_LABELS buckets so long ranges stay readable
+        ticks = x[::max(1, -(-len(dates) // MAX_TICK_LABELS))]
+        labels = [dates[i] for i in ticks]
+        suffix = "" if series["level"] == "Daily" else f" ({series['level']} avg)"
+        for pos, macro, title in self.PANELS:
+            ax = self.axs[pos]
+            if macro in self.bars:
+                self.bars[macro].remove()
+                self.whiskers[macro].remove()
+            self.bars[macro] = ax.bar(x, series["mean"][macro], color="C0", animated=True)
+            self.whiskers[macro] = ax.add_collection(
+                LineCollection(self._whisker_segments(series, macro), colors="black", linewidths=0.8, animated=True)
+            )
+            ax.set_title(title + suffix)
+            ax.set_xticks(ticks)
+            if self.rotate_dates:
+                ax.set_xticklabels(labels, rotation=45, ha="right")
+            else:
+                ax.set_xticklabels(labels)
+            ax.relim()
+            ax.autoscale_view()
+        self.figure.tight_layout()
+
+    def _on_draw(self, event):
+        # Cache everything but the animated artists, then paint those on top
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self._animated():
+            self.figure.draw_artist(artist)
+
+    def _blit(self):
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        for artist in self._animated():
+            self.figure.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+
+
+class TrendsPanel:
+    """ Goal trends for a Tk window: calorie moving averages, weekday averages and a streak/adherence line.
+
+    Built once; ``update(summary, series, limit)`` moves the existing lines
+    and bars. ``summary`` is ``GoalAnalytics.summary()`` and ``series``
+    maps each window to the ``(dates, averages)`` from
+    ``GoalAnalytics.series``.
+    """
+
+    def __init__(self, master, windows, figsize=(8, 3)):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        from analytics import WEEKDAYS
+
+        self.figure = Figure(figsize=figsize)
+        self.trend_ax, self.weekday_ax = self.figure.subplots(1, 2, gridspec_kw={"width_ratios": [2, 1]})
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+
+        self.trend_ax.set_title("Calories, moving average")
+        self.lines = {window: self.trend_ax.plot([], [], label=f"{window}-day")[0] for window in windows}
+        self.limit_line = self.trend_ax.axhline(0, color="red", linestyle="--", linewidth=0.8, label="Limit")
+        self.trend_ax.legend(loc="upper left", fontsize=8)
+
+        self.weekday_ax.set_title("Average calories by weekday")
+        self.weekday_bars = self.weekday_ax.bar(range(len(WEEKDAYS)), [0] * len(WEEKDAYS), color="C0")
+        self.weekday_ax.set_xticks(range(len(WEEKDAYS)))
+        self.weekday_ax.set_xticklabels(WEEKDAYS, fontsize=8)
+
+        self.stats = self.figure.text(0.01, 0.01, "", fontsize=9)
+        self.figure.tight_layout(rect=(0, 0.08, 1, 1))
+
+    def widget(self):
+        return self.canvas.get_tk_widget()
+
+    def update(self, summary, series, limit):
+        for window, line in self.lines.items():
+            dates, values = series[window]
+            line.set_data(np.arange(len(values)), [np.nan if value is None else value for value in values])
+        longest = max((len(series[window][0]) for window in self.lines), default=0)
+        if longest:
+            dates = series[max(self.lines)][0]
+            ticks = np.arange(0, longest, max(1, -(-longest // 6)))
+            self.trend_ax.set_xticks(ticks)
+            self.trend_ax.set_xticklabels([dates[i][5:] for i in ticks], fontsize=8)
+        self.limit_line.set_ydata([limit, limit])
+
+        update_bars(self.weekday_bars, [day["calories"] for day in summary["weekdays"].values()])
+        for ax in (self.trend_ax, self.weekday_ax):
+            ax.relim()
+            ax.autoscale_view()
+
+        adherence = summary["adherence"]
+        self.stats.set_text(
+            f"Streak under limit: {summary['current_streak']} days (best {summary['best_streak']})   "
+            "Adherence: " + ", ".join(f"{macro} {value:.0f}%" for macro, value in adherence.items())
+        )
+        self.canvas.draw_idle()
+
+    def destroy(self):
+        self.canvas.get_tk_widget().destroy()
+        self.figure.clear()
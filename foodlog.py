@@ -0,0 +1,251 @@
+import numpy as np
+
+from records import MACROS, Food, number as _number, period_number, period_start
+from storage import DATA_FILE, get_store
+
+
+def _plain(value):
+    """ Turn a NumPy scalar back into the int/float stored in data.json """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def period_keys(dates, time_period):
+    """ Map datetime64[D] dates to the first day of their Daily/Weekly/Monthly bucket """
+    if time_period not in ("Weekly", "Monthly"):
+        return dates
+    days = dates.astype(np.int64)
+    return period_start(period_number(days, time_period), time_period).astype("datetime64[D]")
+
+
+class FoodLog:
+    """ Columnar food history.
+
+    Macros live in typed NumPy arrays, dates as ``datetime64[D]`` and names as
+    integer codes into an interned name table, so sums and group-bys run
+    vectorized instead of looping over one dict per record. Iterating a
+    FoodLog still yields the familiar ``{"name", "calories", ..., "date"}``
+    dicts for code that wants them.
+
+    Rows are kept sorted by date (stable, so same-day entries stay in the
+    order they were added). The date column is therefore its own index: a
+    date range is found with two binary searches and returned as a
+    contiguous slice.
+    """
+
+    def __init__(self, capacity=16):
+        self._size = 0
+        self.names = []
+        self._codes = {}
+        self._name_code = np.zeros(capacity, dtype=np.int32)
+        self._date = np.zeros(capacity, dtype="datetime64[D]")
+        self._columns = {
+            "calories": np.zeros(capacity, dtype=np.float64),
+            "protein": np.zeros(capacity, dtype=np.float64),
+            "fat": np.zeros(capacity, dtype=np.float64),
+            "carbs": np.zeros(capacity, dtype=np.float64),
+        }
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        log = cls(capacity=max(len(records), 16))
+        log.extend(records)
+        return log
+
+    @classmethod
+    def from_columns(cls, names, name_codes, dates, columns):
+        """ Wrap existing column arrays (e.g. views of a mapped file) without copying them.
+
+        The arrays are used as they are when already in date order and are
+        never written to: capacity equals size, so the first append
+        reallocates.
+        """
+        log = cls(capacity=1)
+        log.names = names
+        log._codes = {name: i for i, name in enumerate(names)}
+        log._name_code = name_codes
+        log._date = dates
+        log._columns = dict(columns)
+        log._size = len(dates)
+        if log._size > 1 and np.any(dates[1:] < dates[:-1]):
+            order = np.argsort(dates, kind="stable")
+            log._name_code = name_codes[order]
+            log._date = dates[order]
+            log._columns = {macro: column[order] for macro, column in log._columns.items()}
+        return log
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.record(i)
+
+    @property
+    def dates(self):
+        return self._date[:self._size]
+
+    @property
+    def name_codes(self):
+        return self._name_code[:self._size]
+
+    def column(self, name):
+        return self._columns[name][:self._size]
+
+    def name_code(self, name):
+        """ Return the interned code for a food name, adding it if new """
+        code = self._codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self._codes[name] = code
+        return code
+
+    def record(self, i):
+        return {
+            "name": self.names[self._name_code[i]],
+            "calories": _plain(self._columns["calories"][i]),
+            "protein": _plain(self._columns["protein"][i]),
+            "fat": _plain(self._columns["fat"][i]),
+            "carbs": _plain(self._columns["carbs"][i]),
+            "date": str(self._date[i]),
+        }
+
+    def append(self, record):
+        self._reserve(self._size + 1)
+        i = self._write(self._size, record)
+        self._size += 1
+        # Entries are almost always for today, so they normally land at the end
+        if i and self._date[i] < self._date[i - 1]:
+            self._move(i, int(np.searchsorted(self._date[:i], self._date[i], side="right")))
+
+    def extend(self, records):
+        records = list(records)
+        start = self._size
+        self._reserve(start + len(records))
+        for i, record in enumerate(records, start):
+            self._write(i, record)
+        self._size += len(records)
+        dates = self.dates
+        if start < self._size and np.any(dates[max(start, 1):] < dates[max(start, 1) - 1:-1]):
+            self._reorder(np.argsort(dates, kind="stable"))
+
+    def _write(self, i, record):
+        if isinstance(record, Food):
+            self._name_code[i] = self.name_code(record.name)
+            self._date[i] = record.day
+            for macro in MACROS:
+                self._columns[macro][i] = getattr(record, macro)
+            return i
+        self._name_code[i] = self.name_code(record.get("name", record.get("food", "")))
+        self._date[i] = np.datetime64(record["date"], "D")
+        for macro in MACROS:
+            self._columns[macro][i] = _number(record.get(macro, 0))
+        return i
+
+    def _move(self, src, dst):
+        """ Move row src to position dst (dst < src), shifting the rows between down one """
+        for column in (self._name_code, self._date, *self._columns.values()):
+            column[dst:src + 1] = np.roll(column[dst:src + 1], 1)
+
+    def _reorder(self, order):
+        n = self._size
+        self._name_code[:n] = self.name_codes[order]
+        self._date[:n] = self.dates[order]
+        for macro in MACROS:
+            self._columns[macro][:n] = self.column(macro)[order]
+
+    def _reserve(self, size):
+        capacity = len(self._date)
+        if size <= capacity:
+            return
+        capacity = max(capacity, 16)
+        while capacity < size:
+            capacity *= 2
+        self._name_code = np.resize(self._name_code, capacity)
+        self._date = np.resize(self._date, capacity)
+        for macro in MACROS:
+            self._columns[macro] = np.resize(self._columns[macro], capacity)
+
+    def _take(self, rows):
+        """ Build a new FoodLog over a contiguous slice of rows without copying them """
+        log = FoodLog(capacity=1)
+        log.names = self.names
+        log._codes = self._codes
+        log._name_code = self.name_codes[rows]
+        log._date = self.dates[rows]
+        log._columns = {macro: self.column(macro)[rows] for macro in MACROS}
+        log._size = len(log._date)
+        # Full capacity means an append reallocates instead of writing into our arrays
+        return log
+
+    def copy(self):
+        """ Return a FoodLog over copies of the rows, unaffected by later appends or inserts into this one """
+        log = self._take(slice(None))
+        log._name_code = log._name_code.copy()
+        log._date = log._date.copy()
+        log._columns = {macro: column.copy() for macro, column in log._columns.items()}
+        return log
+
+    def date_range(self, start=None, end=None):
+        """ Return the (lo, hi) row bounds of the records dated between start and end """
+        dates = self.dates
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+        hi = self._size if end is None else int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+        return lo, max(lo, hi)
+
+    def slice_by_date(self, start=None, end=None):
+        """ Return the records dated between start and end (inclusive) """
+        lo, hi = self.date_range(start, end)
+        return self._take(slice(lo, hi))
+
+    def sum(self):
+        """ Return the total of every macro """
+        return {macro: _plain(self.column(macro).sum()) for macro in MACROS}
+
+    def groupby(self, time_period="Daily"):
+        """ Sum the macros per Daily/Weekly/Monthly bucket, one row per bucket """
+        keys, inverse = np.unique(period_keys(self.dates, time_period), return_inverse=True)
+        grouped = FoodLog(capacity=1)
+        grouped._name_code = np.full(len(keys), grouped.name_code(time_period), dtype=np.int32)
+        grouped._date = keys
+        grouped._columns = {
+            macro: np.bincount(inverse, weights=self.column(macro), minlength=len(keys)).astype(self._columns[macro].dtype)
+            for macro in MACROS
+        }
+        grouped._size = len(keys)
+        return grouped
+
+
+def load_log(path=DATA_FILE):
+    """ Load the stored history as a FoodLog, straight from the columns if the store keeps them """
+    store = get_store(path)
+    if hasattr(store, "log"):
+        return store.log()
+    # Parse straight into slotted Food rows so the per-record dicts never pile up
+    return FoodLog.from_records(store.load(object_hook=Food.from_dict))
+
+
+def aggregate(log):
+    """ Compute every per-date series and the macro totals of a FoodLog in one pass.
+
+    The log is sorted by date, so each date is one contiguous run of rows and
+    a single ``np.add.reduceat`` over the stacked macro columns yields all
+    four daily series at once. Returns ``{"dates": [...], "calories": array,
+    "protein": array, "fat": array, "carbs": array, "totals": {...}}``.
+    """
+    dates = log.dates
+    if not len(dates):
+        series = {macro: np.zeros(0) for macro in MACROS}
+        return dict(series, dates=[], totals={macro: 0 for macro in MACROS})
+
+    starts = np.flatnonzero(np.concatenate(([True], dates[1:] != dates[:-1])))
+    values = np.stack([log.column(macro) for macro in MACROS]).astype(np.float64)
+    per_date = np.add.reduceat(values, starts, axis=1)
+    totals = per_date.sum(axis=1)
+
+    summary = {macro: per_date[i] for i, macro in enumerate(MACROS)}
+    summary["dates"] = dates[starts].astype(str).tolist()
+    summary["totals"] = {macro: _plain(totals[i]) for i, macro in enumerate(MACROS)}
+    return summary
@@ -0,0 +1,100 @@
+""" Saved daily goals, kept as effective-dated versions.
+
+``data.goals.json`` (next to the data file) holds a list of versions,
+oldest first:
+
+    [{"effective": "2024-01-01", "calories": 2000, "protein": 120, "fat": 70, "carbs": 250}, ...]
+
+A version applies from its effective date until the next one starts, so
+past days keep being scored against the goals that applied then. The
+effective dates form a sorted interval index: the goals for a day are one
+binary search away, and a whole column of days is joined to its versions
+with a single ``searchsorted``.
+"""
+import json
+import os
+from bisect import bisect_right
+from records import day_number, day_string, today
+from storage import DATA_FILE
+
+GOALS = ("calories", "protein", "fat", "carbs")
+
+
+def goals_path(data_path=DATA_FILE):
+    return os.path.splitext(data_path)[0] + ".goals.json"
+
+
+class GoalsProfile:
+    def __init__(self, path=None):
+        self.path = path or goals_path()
+        # (effective day numbers, goal dicts), swapped as one tuple so readers on other threads see a consistent pair
+        self._index = ([], [])
+
+    @classmethod
+    def load(cls, path=None):
+        profile = cls(path)
+        try:
+            with open(profile.path, "r") as f:
+                saved = json.load(f)
+            versions = sorted(
+                (day_number(version["effective"]), {goal: version[goal] for goal in GOALS}) for version in saved
+            )
+        except FileNotFoundError:
+            return profile
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{profile.path} is not a valid goals file: {e}")
+        profile._index = ([day for day, _ in versions], [goals for _, goals in versions])
+        return profile
+
+    def __bool__(self):
+        return bool(self._index[0])
+
+    def versions(self):
+        """ Return every version as {"effective", "calories", ...}, oldest first """
+        days, versions = self._index
+        return [{"effective": day_string(day), **goals} for day, goals in zip(days, versions)]
+
+    def current(self):
+        """ Goals in force today, None if none are saved """
+        return self.for_day(today())
+
+    def for_day(self, food_date):
+        """ Goals in force on a date (or day number); days before the first version use the first one """
+        days, versions = self._index
+        if not versions:
+            return None
+        day = food_date if isinstance(food_date, int) else day_number(food_date)
+        return versions[max(bisect_right(days, day) - 1, 0)]
+
+    def version_index(self, day_numbers):
+        """ Join an array of day numbers to the index of the version in force on each """
+        import numpy as np
+
+        days, _ = self._index
+        return np.maximum(np.searchsorted(np.asarray(days, dtype=np.int64), day_numbers, side="right") - 1, 0)
+
+    def set(self, goals, effective=None):
+        """ Save goals effective from a date (default today), replacing a version starting that same day """
+        day = today() if effective is None else day_number(effective)
+        goals = {goal: goals[goal] for goal in GOALS}
+        days, versions = list(self._index[0]), list(self._index[1])
+        i = bisect_right(days, day)
+        if i and days[i - 1] == day:
+            versions[i - 1] = goals
+        elif i and versions[i - 1] == goals:
+            return
+        else:
+            days.insert(i, day)
+            versions.insert(i, goals)
+        self._index = (days, versions)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.versions(), f, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+def load_goals(data_path=DATA_FILE):
+    return GoalsProfile.load(goals_path(data_path))
@@ -0,0 +1,223 @@
+""" Timers, counters and profiling hooks for the tracker's hot paths.
+
+Off unless the CALORIE_TRACKER_TRACE environment variable is set (to a
+trace file path, or to 1 for "trace.jsonl"), or ``enable()`` is called.
+While off, ``span`` returns a shared no-op context manager and ``count``
+returns at once, so instrumented code pays one function call.
+
+While on, every span is added to per-name statistics (count, total, max,
+last), which ``DebugPanel`` shows live, and appended as one JSON line to
+a rolling trace file. ``capture_next()`` profiles the next outermost span
+on any thread with cProfile and writes a .prof file plus a text summary.
+"""
+import json
+import os
+import threading
+import time
+
+# Trace files roll over to <path>.1 at this size
+MAX_TRACE_BYTES = 5 * 1024 * 1024
+
+# Functions listed in a profile's text summary
+PROFILE_LINES = 30
+
+enabled = False
+trace_path = None
+
+_lock = threading.Lock()
+_stats = {}
+_counters = {}
+_trace = None
+_depth = threading.local()
+_capture = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        global _capture
+        depth = getattr(_depth, "value", 0)
+        _depth.value = depth + 1
+        if depth == 0 and _capture is not None:
+            with _lock:
+                armed, _capture = _capture, None
+            if armed is not None:
+                import cProfile
+
+                self.profiler = cProfile.Profile()
+                self.directory = armed
+                self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _depth.value -= 1
+        if self.profiler is not None:
+            self.profiler.disable()
+            _write_profile(self.profiler, self.name, self.directory)
+        _record(self.name, elapsed)
+        return False
+
+
+def enable(path="trace.jsonl"):
+    """ Start collecting; spans are also appended to the trace file at path (None for no file) """
+    global enabled, trace_path
+    trace_path = path
+    enabled = True
+
+
+def disable():
+    global enabled, _trace
+    enabled = False
+    with _lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+
+
+def span(name):
+    """ Time the enclosed block under name: ``with span("storage.load"): ...`` """
+    if not enabled:
+        return _NULL
+    return _Span(name)
+
+
+def count(name, amount=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def capture_next(directory="."):
+    """ Profile the next outermost span started on any thread """
+    global _capture
+    with _lock:
+        _capture = directory
+
+
+def capture_pending():
+    return _capture is not None
+
+
+def snapshot():
+    """ Return ({name: {"count", "total", "max", "last"}}, {counter: value}) copies """
+    with _lock:
+        return {name: dict(stat) for name, stat in _stats.items()}, dict(_counters)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+
+
+def _record(name, elapsed):
+    global _trace
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        stat["count"] += 1
+        stat["total"] += elapsed
+        stat["last"] = elapsed
+        if elapsed > stat["max"]:
+            stat["max"] = elapsed
+
+        if trace_path is None:
+            return
+        if _trace is None:
+            _trace = open(trace_path, "a", buffering=1)
+        _trace.write(json.dumps({
+            "time": round(time.time(), 3),
+            "span": name,
+            "ms": round(elapsed * 1000, 3),
+            "thread": threading.current_thread().name,
+        }) + "\n")
+        if _trace.tell() > MAX_TRACE_BYTES:
+            _trace.close()
+            os.replace(trace_path, trace_path + ".1")
+            _trace = open(trace_path, "a", buffering=1)
+
+
+def _write_profile(profiler, name, directory):
+    import io
+    import pstats
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(directory, f"profile-{name}-{stamp}")
+    profiler.dump_stats(base + ".prof")
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    with open(base + ".txt", "w") as f:
+        f.write(summary.getvalue())
+    count("profiles")
+
+
+class DebugPanel:
+    """ Toplevel window listing span timings and counters, refreshed every poll_ms """
+
+    def __init__(self, root, poll_ms=500):
+        import tkinter as tk
+
+        self.root = root
+        self.poll_ms = poll_ms
+        self.window = tk.Toplevel(root)
+        self.window.title("Tracker Debug")
+        self.text = tk.Text(self.window, width=72, height=24, font=("Courier", 10))
+        self.text.pack(fill=tk.BOTH, expand=True)
+        buttons = tk.Frame(self.window)
+        buttons.pack(fill=tk.X)
+        tk.Button(buttons, text="Profile next action", command=self.profile_next).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Reset", command=reset).pack(side=tk.LEFT)
+        self.note = tk.StringVar()
+        tk.Label(buttons, textvariable=self.note).pack(side=tk.LEFT)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self._job = None
+        self.refresh()
+
+    def profile_next(self):
+        capture_next()
+        self.note.set("Profiling the next action...")
+
+    def refresh(self):
+        stats, counters = snapshot()
+        lines = [f"{'span':<28}{'count':>7}{'mean ms':>10}{'max ms':>10}{'last ms':>10}"]
+        for name in sorted(stats):
+            stat = stats[name]
+            lines.append(f"{name:<28}{stat['count']:>7}{1000 * stat['total'] / stat['count']:>10.1f}"
+                         f"{1000 * stat['max']:>10.1f}{1000 * stat['last']:>10.1f}")
+        if counters:
+            lines.append("")
+            lines.extend(f"{name:<28}{value:>7}" for name, value in sorted(counters.items()))
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", "\n".join(lines))
+        if not capture_pending() and self.note.get():
+            self.note.set("Profile written")
+        self._job = self.root.after(self.poll_ms, self.refresh)
+
+    def close(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+        self.window.destroy()
+
+
+# Opt in from the environment: CALORIE_TRACKER_TRACE=1 or =path/to/trace.jsonl
+if os.environ.get("CALORIE_TRACKER_TRACE"):
+    _setting = os.environ["CALORIE_TRACKER_TRACE"]
+    enable("trace.jsonl" if _setting == "1" else _setting)
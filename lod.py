@@ -0,0 +1,110 @@
+import numpy as np
+
+from foodlog import period_keys
+from records import MACROS, period_number, period_start
+
+# Bucket sizes in order of coarseness, with their average length in days
+LEVELS = (("Daily", 1.0), ("Weekly", 7.0), ("Monthly", 30.44), ("Quarterly", 91.31))
+
+# Narrowest bar worth drawing, in pixels
+MIN_PX_PER_BAR = 8
+
+
+def choose_level(start, end, width_px, min_px=MIN_PX_PER_BAR):
+    """ Pick the finest bucket size whose bars fit the visible range into width_px """
+    days = (np.datetime64(end, "D") - np.datetime64(start, "D")).astype(np.int64) + 1
+    for level, length in LEVELS:
+        if days / length * min_px <= width_px:
+            return level
+    return LEVELS[-1][0]
+
+
+def bucket_starts(dates, level):
+    """ Map datetime64[D] dates to the first day of their bucket """
+    if level == "Quarterly":
+        months = period_number(dates.astype(np.int64), "Monthly")
+        return period_start(months - months % 3, "Monthly").astype("datetime64[D]")
+    return period_keys(dates, level)
+
+
+def downsample(dates, columns, level):
+    """ Reduce sorted per-day series to one min/max/mean/sum row per bucket.
+
+    ``dates`` is a sorted datetime64[D] array and ``columns`` maps each macro
+    to its per-day values. Returns ``{"level", "dates", "sum", "mean", "min",
+    "max"}`` where each statistic maps macro -> array, one entry per bucket.
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    keys = bucket_starts(dates, level)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(keys)))
+    series = {"level": level, "dates": keys[starts], "sum": {}, "mean": {}, "min": {}, "max": {}}
+    for macro in MACROS:
+        values = np.asarray(columns[macro], dtype=np.float64)
+        if not len(values):
+            for stat in ("sum", "mean", "min", "max"):
+                series[stat][macro] = np.zeros(0)
+            continue
+        series["sum"][macro] = np.add.reduceat(values, starts)
+        series["mean"][macro] = series["sum"][macro] / counts
+        series["min"][macro] = np.minimum.reduceat(values, starts)
+        series["max"][macro] = np.maximum.reduceat(values, starts)
+    return series
+
+
+def reduce_summary(summary, width_px):
+    """ Downsample a foodlog.aggregate summary to the level that fits width_px """
+    dates = np.asarray(summary["dates"], dtype="datetime64[D]")
+    level = choose_level(dates[0], dates[-1], width_px) if len(dates) else "Daily"
+    return downsample(dates, summary, level)
+
+
+def decimate_line(x, y, max_points):
+    """ Keep the first, min and max point of each bin so a long line keeps its shape """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+    bins = max(1, max_points // 3)
+    edges = np.linspace(0, len(y), bins + 1).astype(np.int64)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            segment = y[lo:hi]
+            keep.extend(sorted({lo, lo + int(segment.argmin()), lo + int(segment.argmax())}))
+    keep.append(len(y) - 1)
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+class Pyramid:
+    """ Precomputed Daily/Weekly/Monthly/Quarterly reductions of a per-day series.
+
+    Built once from the daily rollups; ``query`` picks the level for the
+    visible range and slices it with a binary search, so serving a chart
+    costs O(buckets shown) however long the history is.
+    """
+
+    def __init__(self, dates, columns):
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        self.start = dates[0] if len(dates) else None
+        self.end = dates[-1] if len(dates) else None
+        self.levels = {level: downsample(dates, columns, level) for level, _ in LEVELS}
+
+    def __len__(self):
+        return len(self.levels["Daily"]["dates"])
+
+    def query(self, width_px, start=None, end=None):
+        """ Return the downsampled series (as ``downsample`` does) plus macro totals """
+        start = self.start if start is None else np.datetime64(start, "D")
+        end = self.end if end is None else np.datetime64(end, "D")
+        level = choose_level(start, end, width_px)
+        series = self.levels[level]
+        # A bucket is shown if any of its days fall in the range
+        lo = int(np.searchsorted(series["dates"], bucket_starts(np.array([start]), level)[0], side="left"))
+        hi = int(np.searchsorted(series["dates"], end, side="right"))
+        sliced = {"level": level, "dates": series["dates"][lo:hi]}
+        for stat in ("sum", "mean", "min", "max"):
+            sliced[stat] = {macro: series[stat][macro][lo:hi] for macro in MACROS}
+        sliced["totals"] = {macro: float(sliced["sum"][macro].sum()) for macro in MACROS}
+        return sliced
@@ -0,0 +1,31 @@
+""" Copy a JSON food log (snapshot + journal) into a SQLite database or a binary .ctlog file.
+
+Usage: python migrate_to_sqlite.py [data.json] [data.db|data.ctlog]
+
+Point CALORIE_TRACKER_DATA at the new file afterwards to use it.
+"""
+import sys
+
+from storage import JournalStore, get_store
+
+BATCH_SIZE = 10000
+
+
+def migrate(json_path, db_path):
+    records = JournalStore(json_path).load()
+    db = get_store(db_path)
+    try:
+        if next(iter(db.query()), None) is not None:
+            raise SystemExit(f"{db_path} already holds food records; refusing to migrate into it.")
+        for i in range(0, len(records), BATCH_SIZE):
+            db.append_many(records[i:i + BATCH_SIZE])
+    finally:
+        db.close()
+    return len(records)
+
+
+if __name__ == "__main__":
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "data.db"
+    count = migrate(json_path, db_path)
+    print(f"Migrated {count} records from {json_path} to {db_path}")
@@ -0,0 +1,185 @@
+""" What-if planner: combinations of known foods that best fill the rest of the day.
+
+Every catalog food is one row of a (foods x macros) matrix. A plan is
+scored by how far its totals land from what is left of each goal, as a
+fraction of the goal, weighted by how the goal is met (see
+``analytics.GOAL_KINDS``): going over the calorie ceiling or staying under
+the protein floor costs more than missing the other way.
+
+Plans grow one food at a time in a beam search. The matrix is sorted by
+calories, so the foods a plan can still take without passing the calorie
+ceiling are a leading slice, found with ``searchsorted``; foods past the
+widest slice are never scored. Every (plan, food) extension of a size is
+scored at once as one float32 array, a macro at a time, the same
+combination reached in another order is dropped, and only the best
+``beam`` plans are extended again.
+
+A beam can drop a plan whose best extension was the overall best, so the
+search is not exact. When the catalog is small enough that every plan of up
+to ``max_items`` foods (repeats allowed) can be scored, there are at most
+``EXHAUSTIVE`` of them and they are all scored instead.
+"""
+from itertools import combinations_with_replacement
+from math import comb
+
+import numpy as np
+
+from analytics import GOAL_KINDS, MACROS, TOLERANCE
+
+# Most foods in one plan
+MAX_ITEMS = 3
+
+# Plans of each size kept for extending to the next size
+BEAM = 64
+
+# Most plans scored one by one, before the beam search takes over
+EXHAUSTIVE = 4000
+
+# Weight of a miss in the direction the goal cares about, and in the other
+HARD = 4.0
+SOFT = 0.25
+
+
+def _weights():
+    """ (weight when over, weight when under) per macro """
+    over, under = [], []
+    for macro in MACROS:
+        kind = GOAL_KINDS[macro]
+        over.append(HARD if kind == "max" else SOFT if kind == "min" else 1.0)
+        under.append(HARD if kind == "min" else 1.0)
+    return np.array(over), np.array(under)
+
+
+class Planner:
+    """ Ranks combinations of up to MAX_ITEMS catalog foods against what is left of the goals """
+
+    def __init__(self, foods):
+        # Foods without any macros can't move a plan; they are left out
+        self.foods = [food for food in foods if any(food.get(macro) for macro in MACROS)]
+        self.matrix = np.array(
+            [[float(food.get(macro) or 0) for macro in MACROS] for food in self.foods], dtype=np.float64
+        ).reshape(-1, len(MACROS))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls(catalog.entries.values())
+
+    def __len__(self):
+        return len(self.foods)
+
+    def plan(self, eaten, goals, max_items=MAX_ITEMS, limit=5, beam=BEAM):
+        """ Return up to limit plans for the rest of the day, best first.
+
+        ``eaten`` and ``goals`` map each macro to today's total and its daily
+        goal. Each plan is ``{"foods": [catalog entries], "totals": {...},
+        "left": {...}, "score": float}``; only plans that get closer to the
+        goals than eating nothing more are returned.
+        """
+        goal = np.array([float(goals[macro]) for macro in MACROS])
+        scale = np.maximum(goal, 1.0)
+        remaining = goal - np.array([float(eaten.get(macro, 0)) for macro in MACROS])
+        left = np.maximum(remaining, 0.0)
+        cap = left[0] + TOLERANCE * goal[0]
+        over, under = _weights()
+
+        if left[0] <= 0:
+            return []
+        candidates = np.argsort(self.matrix[:, 0], kind="stable")
+        candidates = candidates[:np.searchsorted(self.matrix[candidates, 0], cap, side="right")]
+        if not len(candidates):
+            return []
+        matrix = self.matrix[candidates]
+        baseline = float(np.sum(under * (left / scale) ** 2))
+        plans = sum(comb(len(matrix) + size - 1, size) for size in range(1, max_items + 1))
+        if plans <= EXHAUSTIVE:
+            found = self._every_plan(matrix, cap, left, scale, over, under, max_items, limit)
+        else:
+            found = self._beam_search(matrix, cap, left, scale, over, under, max_items, limit, beam)
+
+        found.sort(key=lambda plan: plan[0])
+        results = []
+        for score, combo, plan_totals in found[:limit]:
+            if score >= baseline:
+                break
+            results.append({
+                "foods": [self.foods[candidates[i]] for i in combo],
+                "totals": dict(zip(MACROS, plan_totals.tolist())),
+                "left": dict(zip(MACROS, (remaining - plan_totals).tolist())),
+                "score": float(score),
+            })
+        return results
+
+    def _every_plan(self, matrix, cap, left, scale, over, under, max_items, limit):
+        """ The best limit plans of each size, scoring every combination that fits under cap """
+        found = []
+        for size in range(1, max_items + 1):
+            combos = np.array(list(combinations_with_replacement(range(len(matrix)), size))).reshape(-1, size)
+            totals = matrix[combos].sum(axis=1)
+            fits = totals[:, 0] <= cap
+            combos, totals = combos[fits], totals[fits]
+            if not len(combos):
+                break
+            scores = self._score(totals, left, scale, over, under)
+            found += [(scores[i], combos[i], totals[i]) for i in self._best(scores, limit)]
+        return found
+
+    def _beam_search(self, matrix, cap, left, scale, over, under, max_items, limit, beam):
+        """ The best limit plans of each size among those the beam kept """
+        calories = matrix[:, 0]
+        # Scaled once, so scoring a plan is a subtraction from its scaled remainder
+        scaled = (matrix / scale).astype(np.float32)
+
+        # Plans of one food: every candidate
+        totals = matrix.copy()
+        scores = self._score(totals, left, scale, over, under)
+        combos = np.arange(len(matrix))[:, None]
+        keep = self._best(scores, beam)
+        found = [(scores[i], combos[i], totals[i]) for i in self._best(scores, limit)]
+        combos, totals = combos[keep], totals[keep]
+
+        for _ in range(max_items - 1):
+            ends = np.searchsorted(calories, cap - totals[:, 0], side="right")
+            width = int(ends.max())
+            if not width:
+                break
+            target = ((left - totals) / scale).astype(np.float32)
+            scores = np.zeros((len(totals), width), dtype=np.float32)
+            for m in range(len(MACROS)):
+                deviation = scaled[None, :width, m] - target[:, m, None]
+                if over[m] == under[m]:
+                    scores += np.float32(over[m]) * deviation * deviation
+                else:
+                    scores += np.where(deviation > 0, np.float32(over[m]), np.float32(under[m])) * deviation * deviation
+            scores[np.arange(width)[None, :] >= ends[:, None]] = np.inf
+            # Twice the beam, as some are the same foods in another order
+            best = self._best(scores.ravel(), 2 * beam)
+            scores = scores.ravel()[best]
+            plans = np.column_stack(np.unravel_index(best, (len(totals), width)))
+            plans, scores = plans[np.isfinite(scores)], scores[np.isfinite(scores)]
+            if not len(scores):
+                break
+            extended = np.sort(np.column_stack([combos[plans[:, 0]], plans[:, 1]]), axis=1)
+            _, unique = np.unique(extended, axis=0, return_index=True)
+            unique.sort()
+            scores, plans = scores[unique].astype(np.float64), plans[unique]
+            keep = self._best(scores, beam)
+            scores, plans = scores[keep], plans[keep]
+            combos = np.column_stack([combos[plans[:, 0]], plans[:, 1]])
+            totals = totals[plans[:, 0]] + matrix[plans[:, 1]]
+            found += [(scores[i], combos[i], totals[i]) for i in self._best(scores, limit)]
+
+        return found
+
+    @staticmethod
+    def _score(totals, left, scale, over, under):
+        deviation = (totals - left) / scale
+        return np.sum(np.where(deviation > 0, over, under) * deviation * deviation, axis=1)
+
+    @staticmethod
+    def _best(scores, k):
+        """ Indices of the k lowest scores, lowest first """
+        if len(scores) > k:
+            part = np.argpartition(scores, k)[:k]
+        else:
+            part = np.arange(len(scores))
+        return part[np.argsort(scores[part], kind="stable")]
@@ -0,0 +1,187 @@
+""" Memory-lean food records.
+
+``Food`` is a frozen, slotted dataclass: no per-instance ``__dict__``, the
+name interned so repeated foods share one string, and the date kept as an
+integer day number (days since 1970-01-01) instead of a 10-character
+string. Records are converted to and from the ``{"name", ..., "date"}``
+dicts only at the edges, when they are saved or loaded.
+
+A food logged now also keeps the moment it was logged, as an ISO timestamp
+with its UTC offset (``"time"``). Its date is the tracking day that moment
+falls in: with ``CALORIE_TRACKER_DAY_START=5`` a snack at 02:00 still
+counts toward the previous day, for users whose day doesn't end at
+midnight. Weeks (ISO, Monday first) and months are integer keys derived
+from the day number with integer arithmetic, so grouping never parses a
+date string, and the same functions group whole NumPy columns.
+"""
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+EPOCH = date(1970, 1, 1)
+
+# The nutrient fields of a record, in the order every table and chart shows them
+MACROS = ("calories", "protein", "fat", "carbs")
+
+# Hour (0-23) the tracking day starts; food logged before it counts toward the day before
+DAY_START_HOUR = int(os.environ.get("CALORIE_TRACKER_DAY_START", "0"))
+
+
+def number(value):
+    """ Coerce a stored macro value to a float, treating blanks and junk as 0 """
+    try:
+        return float(value) if value not in [None, "", "NaN"] else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _plain(value):
+    return int(value) if float(value).is_integer() else value
+
+
+@lru_cache(maxsize=4096)
+def day_number(food_date):
+    """ Days since 1970-01-01 of a YYYY-MM-DD date """
+    return (date.fromisoformat(str(food_date)[:10]) - EPOCH).days
+
+
+@lru_cache(maxsize=4096)
+def day_string(day):
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+def now():
+    """ The current local time, with its UTC offset """
+    return datetime.now().astimezone()
+
+
+def tracking_day(moment, day_start=None):
+    """ Day number of the tracking day a zoned moment falls in """
+    hours = DAY_START_HOUR if day_start is None else day_start
+    return ((moment - timedelta(hours=hours)).date() - EPOCH).days
+
+
+def today():
+    """ Day number of the current tracking day """
+    return tracking_day(now())
+
+
+# The calendar helpers below are plain integer arithmetic, so they take a day number or a NumPy
+# array of them alike; every week, month and weekday grouping in the tracker goes through them.
+
+def weekday(day):
+    """ 0 for Monday through 6 for Sunday """
+    # 1970-01-01 was a Thursday
+    return (day + 3) % 7
+
+
+def week_number(day):
+    """ ISO (Monday first) weeks since the one holding 1970-01-01 """
+    return (day + 3) // 7
+
+
+def month_number(day):
+    """ Months since January of year 0 """
+    # Civil-from-days on a calendar whose years start in March, so leap days come last
+    z = day + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    month = mp + 3 - 12 * (mp >= 10)
+    year = yoe + era * 400 + (month <= 2)
+    return year * 12 + month - 1
+
+
+def _month_start(month):
+    """ Day number of the first day of a month_number """
+    year, month = month // 12, month % 12 + 1
+    year = year - (month <= 2)
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+
+def calendar_keys(day):
+    """ (day, week, month) integer keys of a day number """
+    return day, week_number(day), month_number(day)
+
+
+def period_number(day, time_period):
+    """ Integer key of the Daily/Weekly/Monthly bucket a day number falls in """
+    if time_period == "Weekly":
+        return week_number(day)
+    if time_period == "Monthly":
+        return month_number(day)
+    return day
+
+
+def period_start(key, time_period):
+    """ Day number of the first day of a Daily/Weekly/Monthly bucket, given its key """
+    if time_period == "Weekly":
+        return key * 7 - 3
+    if time_period == "Monthly":
+        return _month_start(key)
+    return key
+
+
+@dataclass(frozen=True, slots=True)
+class Food:
+    name: str
+    calories: int
+    protein: float
+    fat: float
+    carbs: float
+    day: int
+    time: str = None
+
+    @classmethod
+    def create(cls, name, calories, protein, fat, carbs, food_date=None):
+        """ A Food for a given date, or logged now (stamped and dated by the tracking day) """
+        if food_date is not None:
+            return cls(sys.intern(str(name)), calories, protein, fat, carbs, day_number(food_date))
+        moment = now()
+        return cls(sys.intern(str(name)), calories, protein, fat, carbs, tracking_day(moment),
+                   moment.isoformat(timespec="seconds"))
+
+    @classmethod
+    def from_dict(cls, record):
+        """ Build a Food from a stored record dict, coercing junk macro values to 0 """
+        return cls(
+            sys.intern(str(record.get("name", record.get("food", "")))),
+            _plain(number(record.get("calories"))),
+            _plain(number(record.get("protein"))),
+            _plain(number(record.get("fat"))),
+            _plain(number(record.get("carbs"))),
+            day_number(record["date"]),
+            record.get("time"),
+        )
+
+    @property
+    def date(self):
+        return day_string(self.day)
+
+    @property
+    def week(self):
+        return week_number(self.day)
+
+    @property
+    def month(self):
+        return month_number(self.day)
+
+    def to_dict(self):
+        record = {
+            "name": self.name,
+            "calories": self.calories,
+            "protein": self.protein,
+            "fat": self.fat,
+            "carbs": self.carbs,
+            "date": self.date,
+        }
+        if self.time is not None:
+            record["time"] = self.time
+        return record
@@ -0,0 +1,154 @@
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from records import MACROS, day_number, day_string, number, period_start, week_number
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+TOP = PAGE_HEIGHT - 50
+BOTTOM = 50
+ROW_HEIGHT = 14
+
+# x position of each table column
+COLUMNS = (("Date", 40), ("Food", 110), ("Calories", 300), ("Protein", 370), ("Fat", 440), ("Carbs", 500))
+
+
+def _week_start(food_date):
+    return day_string(period_start(week_number(day_number(food_date)), "Weekly"))
+
+
+def _fmt(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class ReportWriter:
+    """ Writes the report table one row at a time, starting pages as they fill """
+
+    def __init__(self, path, title):
+        self.canvas = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+        self.title = title
+        self.page = 0
+        self.y = BOTTOM
+        self.rows = 0
+
+    def _new_page(self):
+        if self.page:
+            self.canvas.showPage()
+        self.page += 1
+        self.canvas.setFont("Helvetica-Bold", 14)
+        self.canvas.drawString(40, PAGE_HEIGHT - 35, self.title)
+        self.canvas.setFont("Helvetica", 8)
+        self.canvas.drawRightString(PAGE_WIDTH - 40, PAGE_HEIGHT - 35, f"Page {self.page}")
+        self.canvas.setFont("Helvetica-Bold", 9)
+        for heading, x in COLUMNS:
+            self.canvas.drawString(x, TOP, heading)
+        self.y = TOP - ROW_HEIGHT
+
+    def row(self, cells, bold=False):
+        if not self.page or self.y < BOTTOM:
+            self._new_page()
+        self.canvas.setFont("Helvetica-Bold" if bold else "Helvetica", 9)
+        for (_, x), cell in zip(COLUMNS, cells):
+            self.canvas.drawString(x, self.y, cell)
+        self.y -= ROW_HEIGHT
+        self.rows += 1
+
+    def subtotal(self, label, key, totals):
+        self.row([key, label] + [_fmt(totals[macro]) for macro in MACROS], bold=True)
+        self.y -= ROW_HEIGHT / 2
+
+    def image(self, png, height):
+        if not self.page or self.y - height < BOTTOM:
+            self._new_page()
+        width = PAGE_WIDTH - 80
+        self.canvas.drawImage(ImageReader(png), 40, self.y - height, width=width, height=height, preserveAspectRatio=True)
+        self.y -= height + ROW_HEIGHT
+
+    def save(self):
+        if not self.page:
+            self._new_page()
+        self.canvas.save()
+
+
+def daily_chart_png(days, calories):
+    """ Render the daily calorie totals as a PNG with the Agg backend """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 3), dpi=100)
+    ax = fig.add_subplot()
+    if len(days) > 120:
+        # Thousands of bars are slow to render and unreadable; draw a line instead
+        ax.plot(range(len(days)), calories, color="green", linewidth=0.8)
+    else:
+        ax.bar(range(len(days)), calories, color="green")
+    step = max(1, len(days) // 10)
+    ax.set_xticks(range(0, len(days), step))
+    ax.set_xticklabels(days[::step], rotation=45, ha="right", fontsize=7)
+    ax.set_title("Calories per Day")
+    fig.tight_layout()
+    png = BytesIO()
+    fig.savefig(png, format="png")
+    png.seek(0)
+    return png
+
+
+def write_report(records, path, title="Calorie Tracker Report", charts=True, progress=None, cancelled=None,
+                 chart=daily_chart_png):
+    """ Stream date-ordered food records into a paginated PDF report.
+
+    Each record becomes one table row; a subtotal row closes every day and
+    every week. Records are consumed as they arrive; besides the finished
+    pages reportlab holds until ``save``, only the current day/week totals
+    and one number per day (for the closing chart) are kept.
+    ``progress(rows)`` is called every 1000 rows and the run stops early,
+    without saving, if ``cancelled()`` returns true. Returns the number of
+    food rows written. ``chart(days, calories)`` renders the closing chart
+    as PNG bytes.
+    """
+    writer = ReportWriter(path, title)
+    day_key = week_key = None
+    day_totals = week_totals = None
+    days, day_calories = [], []
+    count = 0
+
+    def close_day():
+        writer.subtotal("Day total", day_key, day_totals)
+        days.append(day_key)
+        day_calories.append(day_totals["calories"])
+
+    for food in records:
+        food_date = food["date"]
+        if food_date != day_key:
+            if day_key is not None:
+                close_day()
+            week = _week_start(food_date)
+            if week != week_key:
+                if week_key is not None:
+                    writer.subtotal("Week total", week_key, week_totals)
+                week_key, week_totals = week, dict.fromkeys(MACROS, 0)
+            day_key, day_totals = food_date, dict.fromkeys(MACROS, 0)
+
+        # Blank or junk macro values count as 0, as they do when loaded into a FoodLog
+        values = [number(food.get(macro)) for macro in MACROS]
+        writer.row([food_date, str(food.get("name", ""))[:35]] + [_fmt(value) for value in values])
+        for macro, value in zip(MACROS, values):
+            day_totals[macro] += value
+            week_totals[macro] += value
+
+        count += 1
+        if count % 1000 == 0:
+            if cancelled is not None and cancelled():
+                return count
+            if progress is not None:
+                progress(count)
+
+    if day_key is not None:
+        close_day()
+        writer.subtotal("Week total", week_key, week_totals)
+        if charts:
+            writer.image(chart(days, day_calories), height=220)
+
+    writer.save()
+    return count
@@ -0,0 +1,130 @@
+import json
+import os
+
+from foodlog import MACROS, FoodLog
+from records import day_number, day_string, period_number, period_start
+from storage import DATA_FILE, get_store
+
+PERIODS = ("Daily", "Weekly", "Monthly")
+
+
+def rollup_path(data_path=DATA_FILE):
+    return os.path.splitext(data_path)[0] + ".rollups.json"
+
+
+def period_key(food_date, time_period):
+    """ Return the first day (YYYY-MM-DD) of the bucket a date (or day number) falls in """
+    day = food_date if isinstance(food_date, int) else day_number(food_date)
+    return day_string(period_start(period_number(day, time_period), time_period))
+
+
+class RollupCache:
+    """ Materialized Daily/Weekly/Monthly macro totals.
+
+    Each table maps the first day of a bucket to its
+    ``[calories, protein, fat, carbs]`` totals. ``add`` updates all three
+    tables in O(1), so period charts read their series straight from here
+    instead of regrouping the whole log.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or rollup_path()
+        self.count = 0
+        self.tables = {period: {} for period in PERIODS}
+        self._pyramid = None
+
+    @classmethod
+    def load(cls, path=None):
+        cache = cls(path)
+        try:
+            with open(cache.path, "r") as f:
+                saved = json.load(f)
+            cache.count = saved["count"]
+            cache.tables = {period: saved["tables"][period] for period in PERIODS}
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            cache = cls(path)
+        return cache
+
+    @classmethod
+    def build(cls, log, path=None):
+        """ Rebuild every table from a FoodLog with one vectorized groupby per period """
+        cache = cls(path)
+        cache.count = len(log)
+        for period in PERIODS:
+            grouped = log.groupby(period)
+            columns = [grouped.column(macro).tolist() for macro in MACROS]
+            cache.tables[period] = {
+                str(key): [row[i] for row in columns] for i, key in enumerate(grouped.dates)
+            }
+        return cache
+
+    @classmethod
+    def from_store(cls, store, count, path=None):
+        """ Rebuild every table with the store's SQL-side GROUP BY """
+        cache = cls(path)
+        cache.count = count
+        for period in PERIODS:
+            cache.tables[period] = {
+                row["date"]: [row[macro] for macro in MACROS] for row in store.rollup(period)
+            }
+        return cache
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"count": self.count, "tables": self.tables}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def add(self, food):
+        """ Fold one food record into every table """
+        values = [food[macro] for macro in MACROS]
+        day = day_number(food["date"])
+        for period in PERIODS:
+            totals = self.tables[period].setdefault(period_key(day, period), [0, 0, 0, 0])
+            for i, value in enumerate(values):
+                totals[i] += value
+        self.count += 1
+        self._pyramid = None
+
+    def matches(self, log):
+        """ Check the cache against the raw log by record count and grand totals """
+        if self.count != len(log):
+            return False
+        totals = log.sum()
+        for period in PERIODS:
+            for i, macro in enumerate(MACROS):
+                if abs(sum(row[i] for row in self.tables[period].values()) - totals[macro]) > 1e-6:
+                    return False
+        return True
+
+    def pyramid(self):
+        """ Return the level-of-detail pyramid over the daily table, rebuilt after each add """
+        if self._pyramid is None:
+            from lod import Pyramid
+
+            table = self.tables["Daily"]
+            days = sorted(table)
+            self._pyramid = Pyramid(days, {macro: [table[day][i] for day in days] for i, macro in enumerate(MACROS)})
+        return self._pyramid
+
+    def grouped(self, time_period):
+        """ Return the buckets of a period as a FoodLog, one row per bucket in date order """
+        table = self.tables[time_period]
+        return FoodLog.from_records(
+            dict(zip(MACROS, table[key]), name=time_period, date=key) for key in sorted(table)
+        )
+
+
+def load_rollups(log, data_path=DATA_FILE):
+    """ Load the saved rollups, rebuilding and saving them if they disagree with the log """
+    cache = RollupCache.load(rollup_path(data_path))
+    if not cache.matches(log):
+        store = get_store(data_path)
+        if hasattr(store, "rollup"):
+            cache = RollupCache.from_store(store, len(log), rollup_path(data_path))
+        else:
+            cache = RollupCache.build(log, rollup_path(data_path))
+        cache.save()
+    return cache
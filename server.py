@@ -0,0 +1,356 @@
+""" Multi-user HTTP API over the tracker data.
+
+Usage: python server.py [--host 127.0.0.1] [--port 8080] [--data-dir users]
+
+Every user gets their own SQLite database (``<data-dir>/<user>.db``).
+
+    POST /users/<user>/foods                    add one food (JSON object) or several (JSON list)
+    GET  /users/<user>/foods?start=&end=        foods dated in the range, in date order
+    GET  /users/<user>/rollups/<period>?start=&end=
+                                                Daily/Weekly/Monthly macro totals
+    GET  /health
+
+Reads run on a small pool of SQLite connections per user, off the event
+loop. Writes arriving close together are queued and committed in one
+transaction per user. Rollup responses are cached per user until their
+next write.
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import re
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+from bulk_import import build_mapping, validate
+from storage import SqliteStore
+
+USER_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Read connections kept open per user
+POOL_SIZE = 4
+
+# Users whose stores and pools stay open; the least recently used is closed first
+MAX_OPEN_USERS = 256
+
+# Longest a write waits for others to share its transaction, and the most it shares with
+BATCH_DELAY = 0.005
+BATCH_SIZE = 500
+
+# Cached rollup responses kept per user
+CACHE_ENTRIES = 64
+
+MAX_BODY = 1 << 20
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """ A fixed set of read connections to one SQLite file, handed out one caller at a time """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._opened < self.size:
+            self._opened += 1
+            return sqlite3.connect(self.path, check_same_thread=False)
+        return self._idle.get()
+
+    def release(self, conn):
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class UserDb:
+    """ One user's store: the writer connection, the read pool, the write queue and the rollup cache """
+
+    def __init__(self, path):
+        self.store = SqliteStore(path)
+        self.pool = ConnectionPool(path)
+        self.pending = []
+        self.flusher = None
+        self.version = 0
+        self.cache = OrderedDict()
+        self.active = 0
+
+    def read(self, fn, *args):
+        conn = self.pool.acquire()
+        try:
+            return fn(conn, *args)
+        finally:
+            self.pool.release(conn)
+
+    def cached(self, key):
+        body = self.cache.get(key)
+        if body is not None:
+            self.cache.move_to_end(key)
+        return body
+
+    def remember(self, key, version, body):
+        # A write that landed while the query ran makes its result stale
+        if version == self.version:
+            self.cache[key] = body
+            if len(self.cache) > CACHE_ENTRIES:
+                self.cache.popitem(last=False)
+
+    def close(self):
+        self.pool.close()
+        self.store.close()
+
+
+class TrackerServer:
+    def __init__(self, data_dir, workers=8):
+        self.data_dir = data_dir
+        self.users = OrderedDict()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tracker-db")
+        self.mapping = build_mapping([])
+        os.makedirs(data_dir, exist_ok=True)
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def user(self, name):
+        if not USER_NAME.match(name) or name.startswith("."):
+            raise HttpError(400, "invalid user name")
+        db = self.users.get(name)
+        if db is None:
+            db = UserDb(os.path.join(self.data_dir, name + ".db"))
+            self.users[name] = db
+            self._evict()
+        self.users.move_to_end(name)
+        return db
+
+    def _evict(self):
+        for name in list(self.users):
+            if len(self.users) <= MAX_OPEN_USERS:
+                break
+            db = self.users[name]
+            if not db.active and not db.pending and db.flusher is None:
+                del self.users[name]
+                db.close()
+
+    async def _in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def handle(self, reader, writer):
+        """ Serve requests on one keep-alive connection """
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                try:
+                    status, payload = await self.route(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    status, payload = 500, json.dumps({"error": repr(e)}).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e:
+            writer.write(response(e.status, json.dumps({"error": str(e)}).encode(), False))
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if parts == ["health"]:
+            return 200, b'{"status": "ok"}'
+        if len(parts) < 3 or parts[0] != "users":
+            raise HttpError(404, "not found")
+
+        db = self.user(parts[1])
+        db.active += 1
+        try:
+            if parts[2:] == ["foods"]:
+                if method == "POST":
+                    return 201, await self.add_foods(db, body)
+                if method == "GET":
+                    return 200, await self.query_foods(db, params)
+                raise HttpError(405, "use GET or POST")
+            if parts[2] == "rollups" and len(parts) == 4:
+                if method != "GET":
+                    raise HttpError(405, "use GET")
+                return 200, await self.rollup(db, parts[3].capitalize(), params)
+            raise HttpError(404, "not found")
+        finally:
+            db.active -= 1
+
+    async def add_foods(self, db, body):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise HttpError(400, "body is not JSON")
+        rows = payload if isinstance(payload, list) else [payload]
+        records = []
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                raise HttpError(400, f"food {i} is not an object")
+            try:
+                records.append(validate(row, self.mapping))
+            except ValueError as e:
+                raise HttpError(400, f"food {i}: {e}")
+
+        # Queue the records; the first write of a batch schedules the flush
+        done = asyncio.get_running_loop().create_future()
+        db.pending.append((records, done))
+        if db.flusher is None:
+            db.flusher = asyncio.create_task(self._flush(db))
+        elif sum(len(r) for r, _ in db.pending) >= BATCH_SIZE:
+            db.flusher.cancel()
+            db.flusher = asyncio.create_task(self._flush(db, delay=0))
+        await done
+        return json.dumps({"added": len(records)}).encode()
+
+    async def _flush(self, db, delay=BATCH_DELAY):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        batch, db.pending, db.flusher = db.pending, [], None
+        records = [record for rows, _ in batch for record in rows]
+        try:
+            await self._in_thread(db.store.append_many, records)
+        except Exception as e:
+            for _, done in batch:
+                done.set_exception(e)
+            return
+        db.version += 1
+        db.cache.clear()
+        for _, done in batch:
+            done.set_result(None)
+
+    async def query_foods(self, db, params):
+        start, end = date_params(params)
+
+        def fetch(conn):
+            return json.dumps(list(db.store.query(start, end, conn=conn))).encode()
+
+        return await self._in_thread(db.read, fetch)
+
+    async def rollup(self, db, period, params):
+        if period not in SqliteStore.PERIOD_KEYS:
+            raise HttpError(404, f"unknown period {period!r}")
+        start, end = date_params(params)
+        key = (period, start, end)
+        body = db.cached(key)
+        if body is None:
+            version = db.version
+            rows = await self._in_thread(db.read, lambda conn: db.store.rollup(period, start, end, conn=conn))
+            body = json.dumps(rows).encode()
+            db.remember(key, version, body)
+        return body
+
+    def close(self):
+        for db in self.users.values():
+            db.close()
+        self.executor.shutdown()
+
+
+def date_params(params):
+    dates = []
+    for name in ("start", "end"):
+        value = params.get(name)
+        if value is not None:
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise HttpError(400, f"invalid {name} date")
+        dates.append(value)
+    return dates
+
+
+async def read_request(reader):
+    """ Read one HTTP/1.1 request; returns None when the client closed the connection """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "bad Content-Length")
+    if length < 0:
+        raise HttpError(400, "bad Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def response(status, payload, keep_alive=True):
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", default="users", help="directory holding one database per user")
+    parser.add_argument("--workers", type=int, default=8, help="threads running database work")
+    args = parser.parse_args()
+
+    server = TrackerServer(args.data_dir, args.workers)
+    print(f"Serving on http://{args.host}:{args.port}", flush=True)
+    try:
+        asyncio.run(server.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
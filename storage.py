@@ -0,0 +1,757 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from instrument import span
+from records import calendar_keys, day_number, day_string, period_start
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) writes from several processes are not serialized
+    fcntl = None
+
+# Load saved data; a .db/.sqlite path selects the SQLite backend and .ctlog the binary log
+DATA_FILE = os.environ.get("CALORIE_TRACKER_DATA", "data.json")
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# Fixed-width binary log, see binlog.py
+BINARY_EXTENSIONS = (".ctlog",)
+
+# Compact the journal into the snapshot once it holds this many records
+COMPACT_THRESHOLD = 500
+
+# Seconds without a new record before WriteBehind writes its buffer, and the longest a record waits
+FLUSH_DELAY = 0.5
+MAX_FLUSH_DELAY = 5.0
+
+
+class CorruptDataError(ValueError):
+    """ Raised when stored data cannot be read; the files are left as they are """
+
+
+@contextmanager
+def file_lock(path):
+    """ Hold an exclusive lock on ``<path>.lock`` so processes sharing a data file write one at a time """
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def file_key(path):
+    """ (inode, size, mtime) of path, None if it does not exist; a cheap "did it change" check """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _same_file(key, other):
+    """ Whether two file_keys are of the same file (or both missing), whatever its size now """
+    return (key and key[0]) == (other and other[0])
+
+
+def _add_own(ranges, start, end):
+    """ Record that this process wrote records start..end-1, merging with the previous range """
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
+
+
+def _own_ranges(ranges, index):
+    """ Drop the ranges of own writes that end at or before index """
+    return [(start, end) for start, end in ranges if end > index]
+
+
+def _is_own(ranges, index):
+    return any(start <= index < end for start, end in ranges)
+
+
+class JournalStore:
+    """ Snapshot + append-only journal storage for food records.
+
+    The snapshot (``data.json``) keeps the original indented JSON list so old
+    files still load. Each new record is written as one JSON line to
+    ``data.json.journal``, so adding food costs O(1) bytes regardless of the
+    size of the history. Every journal starts with a header line
+    ``{"base": N}``: its first record is record number N of the whole log.
+    On replay, records the snapshot already contains are skipped, which makes
+    recovery correct whichever step of a compaction a crash interrupted.
+
+    Several processes can share the files: appends, journal rotation and
+    rewrites hold a lock file, and a process re-counts the records when the
+    journal changed since its own last write. ``read_new`` returns the
+    records other processes appended since a ``cursor``.
+    """
+
+    def __init__(self, path=DATA_FILE, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compacting_path = path + ".compacting"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._count = None
+        self._journal_count = 0
+        # Journal key after this process last counted or wrote it
+        self._journal_key = None
+        # Records this process appended, as (first index, end index) ranges
+        self._own = []
+        self._loaded = (0, None, 0, None)
+
+    def load(self, object_hook=None):
+        """ Replay snapshot, then any journal being compacted, then the live journal.
+
+        ``object_hook`` converts each record dict as it is parsed (for example
+        into a ``records.Food``).
+        """
+        with self._lock:
+            with file_lock(self.path):
+                self._repair_journal()
+            records, snapshot_key, journal_key = self._read_all(object_hook)
+            self._count = len(records)
+            self._journal_count = self._count_journal()
+            self._journal_key = journal_key
+            self._loaded = (len(records), None, 0, snapshot_key)
+            return records
+
+    def cursor(self):
+        """ Position just past the records the last ``load`` returned, for ``read_new`` """
+        return self._loaded
+
+    def read_new(self, cursor):
+        """ Return (records other processes appended since cursor, new cursor).
+
+        Usually this is one stat of the journal, plus reading the lines
+        added past the byte offset the cursor remembers. If a compaction
+        rotated the journal, the rest of the old one is read from its
+        ``.compacting`` name, or from the snapshot once it has been folded
+        in. Records this process appended are left out. The records are
+        None if the history was rewritten and must be loaded again.
+        """
+        index, journal_key, offset, snapshot_key = cursor
+        key = file_key(self.journal_path)
+        if key is not None and journal_key is not None and key[0] == journal_key[0] and key[1] >= offset:
+            if key == journal_key:
+                return [], cursor
+            found, offset, end = self._read_lines(self.journal_path, offset, index)
+            return self._not_own(found, end), (end, key, offset, snapshot_key)
+
+        # First read, or the journal was rotated or removed since the last one
+        found = []
+        if journal_key is not None:
+            compacting = file_key(self.compacting_path)
+            if compacting is not None and compacting[0] == journal_key[0]:
+                found, _, index = self._read_lines(self.compacting_path, offset, index)
+        if key is None:
+            snapshot = file_key(self.path)
+            if snapshot == snapshot_key:
+                return self._not_own(found, index), (index, None, 0, snapshot_key)
+            records = self._snapshot_records()
+            if len(records) < index:
+                return None, self.cursor()
+            found += list(enumerate(records[index:], index))
+            return self._not_own(found, len(records)), (len(records), None, 0, snapshot)
+        lines, offset, end = self._read_lines(self.journal_path, 0, index)
+        base = end - len(lines)
+        if end < index:
+            return None, self.cursor()
+        if base > index:
+            # The records in between were already folded into the snapshot
+            found += list(enumerate(self._snapshot_records()[index:base], index))
+        found += [(i, record) for i, record in lines if i >= index]
+        return self._not_own(found, end), (end, key, offset, None)
+
+    def query(self, start=None, end=None):
+        """ Yield the records dated between start and end (inclusive) in date order.
+
+        Neither the snapshot nor the journal is in date order, so unlike the
+        other stores this reads the whole history into memory to sort it;
+        streaming callers with a FoodLog at hand should read from that. The
+        position ``load`` left for ``read_new`` is not changed.
+        """
+        records = self._read_all()[0]
+        records.sort(key=lambda r: r["date"])
+        for record in records:
+            if (start is None or record["date"] >= str(start)) and (end is None or record["date"] <= str(end)):
+                yield record
+
+    def append(self, record):
+        """ Append one record to the journal """
+        self.append_many([record])
+
+    def append_many(self, records, compact=True):
+        """ Append records to the journal with a single write and fsync.
+
+        Bulk loaders pass ``compact=False`` and call ``compact_async`` once at
+        the end instead of compacting after every batch.
+        """
+        if not records:
+            return
+        with self._lock, file_lock(self.path):
+            self._sync_count()
+            if not os.path.exists(self.journal_path):
+                self._start_journal(self._count)
+            lines = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+            with open(self.journal_path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            _add_own(self._own, self._count, self._count + len(records))
+            self._count += len(records)
+            self._journal_count += len(records)
+            self._journal_key = file_key(self.journal_path)
+            should_compact = self._journal_count >= self.compact_threshold
+        if should_compact and compact:
+            self.compact_async()
+
+    def save(self, data):
+        """ Rewrite the snapshot with the full history and drop the journals """
+        with self._lock, file_lock(self.path):
+            self._write_snapshot(data)
+            for journal in (self.compacting_path, self.journal_path):
+                if os.path.exists(journal):
+                    os.remove(journal)
+            self._count = len(data)
+            self._journal_count = 0
+            self._journal_key = None
+
+    def compact_async(self):
+        """ Fold the journal into the snapshot on a background thread """
+        with self._lock, file_lock(self.path):
+            if self._compactor is not None and self._compactor.is_alive():
+                return self._compactor
+            # An interrupted compaction is finished before a new one is started
+            if not os.path.exists(self.compacting_path) and os.path.exists(self.journal_path):
+                self._sync_count()
+                # New appends go to a fresh journal while this one is folded in
+                os.replace(self.journal_path, self.compacting_path)
+                self._start_journal(self._count)
+                self._journal_count = 0
+                self._journal_key = file_key(self.journal_path)
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+            return self._compactor
+
+    def compact(self):
+        """ Merge the journal being compacted into a new snapshot """
+        # Its own lock file, so appends from other processes carry on meanwhile
+        with file_lock(self.compacting_path):
+            if not os.path.exists(self.compacting_path):
+                return
+            records = self._read_snapshot()
+            self._replay(self.compacting_path, records)
+            self._write_snapshot(records)
+            os.remove(self.compacting_path)
+
+    def wait(self):
+        """ Block until a running compaction has finished """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _start_journal(self, base):
+        with open(self.journal_path, "w") as f:
+            f.write(json.dumps({"base": base}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _sync_count(self):
+        """ Count the records again if the journal changed since this process last counted or wrote it """
+        if self._count is not None and file_key(self.journal_path) == self._journal_key:
+            return
+        self._repair_journal()
+        base = self._journal_base(self.journal_path)
+        if base is None:
+            while True:
+                snapshot_key = file_key(self.path)
+                count = self._skip_count(self.compacting_path, len(self._read_snapshot()))
+                if self._unchanged(snapshot_key, None):
+                    break
+        else:
+            # The header already counts everything before this journal
+            count = base
+        self._count = self._skip_count(self.journal_path, count)
+        self._journal_count = self._count_journal()
+        self._journal_key = file_key(self.journal_path)
+
+    def _journal_base(self, journal):
+        try:
+            with open(journal, "r") as f:
+                return json.loads(f.readline())["base"]
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            raise CorruptDataError(f"{journal} is corrupt: unreadable header")
+
+    def _read_lines(self, journal, offset, index):
+        """ Read the complete lines of a journal from a byte offset.
+
+        ``index`` is the number of the record at that offset; from offset 0
+        the header gives it. Returns ([(index, record)], offset after the
+        last complete line, index after it).
+        """
+        try:
+            f = open(journal, "rb")
+        except FileNotFoundError:
+            return [], offset, index
+        with f:
+            f.seek(offset)
+            if offset == 0:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return [], 0, index
+                index = self._journal_base(journal)
+                offset = len(header)
+            content = f.read()
+        found = []
+        for line in content.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                found.append((index, json.loads(line)))
+            except ValueError:
+                raise CorruptDataError(f"{journal} is corrupt near byte {offset}")
+            index += 1
+            offset += len(line)
+        return found, offset, index
+
+    def _read_all(self, object_hook=None):
+        """ Return (records, snapshot key, journal key): snapshot, then the journal being compacted, then the live one """
+        while True:
+            # Keys taken before reading: a change made meanwhile makes them differ, which forces a re-count
+            journal_key = file_key(self.journal_path)
+            snapshot_key = file_key(self.path)
+            records = self._read_snapshot(object_hook)
+            for journal in (self.compacting_path, self.journal_path):
+                self._replay(journal, records, object_hook)
+            if self._unchanged(snapshot_key, journal_key):
+                return records, snapshot_key, journal_key
+
+    def _snapshot_records(self):
+        while True:
+            snapshot_key = file_key(self.path)
+            records = self._read_snapshot()
+            self._replay(self.compacting_path, records)
+            if file_key(self.path) == snapshot_key:
+                return records
+
+    def _unchanged(self, snapshot_key, journal_key):
+        """ Whether no compaction swapped the snapshot or rotated the journal since the keys were taken.
+
+        A compaction in another process (or on the compactor thread) can
+        replace the snapshot and remove ``.compacting`` between reading one
+        and the other, so a reader that finds either changed reads again.
+        """
+        return file_key(self.path) == snapshot_key and _same_file(file_key(self.journal_path), journal_key)
+
+    def _not_own(self, found, index):
+        """ The records of found that this process did not append itself """
+        with self._lock:
+            own = self._own
+            self._own = _own_ranges(own, index)
+        return [record for i, record in found if not _is_own(own, i)]
+
+    def _repair_journal(self):
+        """ Cut a torn last line left by a crash so later appends stay readable """
+        try:
+            with open(self.journal_path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        good = 0
+        lines = content.splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            try:
+                json.loads(line)
+            except ValueError:
+                if i < len(lines) - 1:
+                    raise CorruptDataError(f"{self.journal_path} is corrupt: line {i + 1} is unreadable")
+                break
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+        if good == 0:
+            os.remove(self.journal_path)
+        elif good < len(content):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+
+    def _read_snapshot(self, object_hook=None):
+        try:
+            with open(self.path, "r") as f:
+                records = json.load(f, object_hook=object_hook)
+        except FileNotFoundError:
+            return []
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CorruptDataError(f"{self.path} is corrupt: {e}")
+        if not isinstance(records, list):
+            raise CorruptDataError(f"{self.path} is corrupt: expected a list of foods")
+        return records
+
+    def _write_snapshot(self, data):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _iter_journal(self, journal, object_hook=None):
+        """ Yield (index, record) pairs, stopping at a torn trailing line """
+        try:
+            f = open(journal, "r")
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.readline()
+            try:
+                base = json.loads(header)["base"]
+            except (ValueError, KeyError, TypeError):
+                if f.read().strip():
+                    raise CorruptDataError(f"{journal} is corrupt: unreadable header")
+                return
+            for i, line in enumerate(f):
+                try:
+                    record = json.loads(line, object_hook=object_hook)
+                except json.JSONDecodeError:
+                    # Only the last line can be torn by a crash; anything after it means damage
+                    if f.read().strip():
+                        raise CorruptDataError(f"{journal} is corrupt: line {i + 2} is unreadable")
+                    break
+                if not line.endswith("\n"):
+                    break
+                yield base + i, record
+
+    def _replay(self, journal, records, object_hook=None):
+        for index, record in self._iter_journal(journal, object_hook):
+            if index >= len(records):
+                records.append(record)
+
+    def _skip_count(self, journal, count):
+        for index, _ in self._iter_journal(journal):
+            if index >= count:
+                count = index + 1
+        return count
+
+    def _count_journal(self):
+        return sum(1 for _ in self._iter_journal(self.journal_path))
+
+
+class SqliteStore:
+    """ SQLite storage for food records.
+
+    Runs in WAL mode so several app instances can read while one writes, and
+    every append is a transaction, so concurrent writers add rows instead of
+    overwriting each other's files. Each row also stores the integer day,
+    ISO week and month keys of its date, computed once at insert: range
+    queries compare the indexed day column and ``rollup`` groups on the
+    keys in SQL, without parsing a date string per row.
+    ``read_new`` returns rows other connections inserted since a cursor; it
+    checks ``PRAGMA data_version`` first, so polling an unchanged database
+    costs one pragma.
+    """
+
+    COLUMNS = ("name", "calories", "protein", "fat", "carbs", "date")
+
+    # Column holding the key of the bucket a row falls in
+    PERIOD_KEYS = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+
+    INSERT = (
+        "INSERT INTO foods (name, calories, protein, fat, carbs, date, time, day, week, month) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS foods ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL, calories NUMERIC, "
+                "protein NUMERIC, fat NUMERIC, carbs NUMERIC, date TEXT NOT NULL, "
+                "time TEXT, day INTEGER, week INTEGER, month INTEGER)"
+            )
+            self._add_calendar_keys()
+            self._conn.execute("DROP INDEX IF EXISTS foods_date")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS foods_day ON foods (day)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS foods_name ON foods (name)")
+        # Row ids this process inserted, as (first id, end id) ranges
+        self._own = []
+        self._loaded = (0, 0, None)
+
+    def load(self, object_hook=None):
+        # One read transaction, so the cursor matches exactly the rows returned
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("BEGIN")
+            self._loaded = self._position(conn) + (None,)
+            records = self.query(conn=conn)
+            if object_hook is None:
+                return list(records)
+            return [object_hook(record) for record in records]
+        finally:
+            conn.close()
+
+    def cursor(self):
+        """ Position just past the rows the last ``load`` returned, for ``read_new`` """
+        return self._loaded
+
+    def read_new(self, cursor):
+        """ Return (rows other connections inserted since cursor, new cursor).
+
+        The rows are None if rows were deleted or replaced, in which case the
+        history must be loaded again.
+        """
+        last_id, count, version = cursor
+        with self._lock:
+            current = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if current == version:
+                return [], cursor
+            rows = self._conn.execute(
+                "SELECT id, name, calories, protein, fat, carbs, date, time FROM foods WHERE id > ? ORDER BY id",
+                (last_id,),
+            ).fetchall()
+            new_last, new_count = self._position(self._conn)
+            own = self._own
+            self._own = _own_ranges(own, new_last + 1)
+        if new_count != count + len(rows):
+            return None, (new_last, new_count, current)
+        records = [self._record(row[1:]) for row in rows if not _is_own(own, row[0])]
+        return records, (max([last_id] + [row[0] for row in rows]), new_count, current)
+
+    def query(self, start=None, end=None, batch_size=1000, conn=None):
+        """ Yield the records dated between start and end (inclusive) in date order.
+
+        Rows are streamed in batches over a separate read connection (or the
+        caller's ``conn``), so memory stays flat however many records match.
+        """
+        sql = "SELECT name, calories, protein, fat, carbs, date, time FROM foods"
+        where, args = self._date_filter(start, end)
+        own_conn = conn is None
+        if own_conn:
+            conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(sql + where + " ORDER BY day, id", args)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._record(row)
+        finally:
+            if own_conn:
+                conn.close()
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, compact=True):
+        """ Insert records in one transaction (compact is accepted for interface parity) """
+        rows = [self._row(r) for r in records]
+        with self._lock, self._conn:
+            self._conn.executemany(self.INSERT, rows)
+            if rows:
+                # Still inside the write transaction, so these ids are the ones just inserted
+                last_id = self._conn.execute("SELECT max(id) FROM foods").fetchone()[0]
+                _add_own(self._own, last_id - len(rows) + 1, last_id + 1)
+
+    def save(self, data):
+        """ Replace every stored record with data """
+        rows = [self._row(r) for r in data]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM foods")
+            self._conn.executemany(self.INSERT, rows)
+
+    def rollup(self, time_period, start=None, end=None, conn=None):
+        """ Return one {"date", "calories", "protein", "fat", "carbs"} row per bucket.
+
+        Runs on the store's own connection unless a read connection is given.
+        """
+        key = self.PERIOD_KEYS[time_period]
+        where, args = self._date_filter(start, end)
+        sql = (
+            f"SELECT {key} AS bucket, SUM(calories), SUM(protein), SUM(fat), SUM(carbs) "
+            f"FROM foods{where} GROUP BY bucket ORDER BY bucket"
+        )
+        if conn is not None:
+            rows = conn.execute(sql, args).fetchall()
+        else:
+            with self._lock:
+                rows = self._conn.execute(sql, args).fetchall()
+        # Buckets are labelled with their first day, as the other stores do
+        return [
+            dict(zip(("date", "calories", "protein", "fat", "carbs"), [day_string(period_start(key, time_period))] + totals))
+            for key, *totals in rows
+        ]
+
+    def close(self):
+        self._conn.close()
+
+    def _add_calendar_keys(self):
+        """ Add the time and calendar key columns to a database created before them, filling the keys in """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(foods)")}
+        if "day" in columns:
+            return
+        for column in ("time TEXT", "day INTEGER", "week INTEGER", "month INTEGER"):
+            self._conn.execute(f"ALTER TABLE foods ADD COLUMN {column}")
+        # Filled in by the same functions as new rows, so old and new rows group alike
+        rows = self._conn.execute("SELECT id, date FROM foods").fetchall()
+        self._conn.executemany(
+            "UPDATE foods SET day = ?, week = ?, month = ? WHERE id = ?",
+            (calendar_keys(day_number(food_date)) + (row_id,) for row_id, food_date in rows),
+        )
+
+    def _row(self, record):
+        """ INSERT parameters of a record, with the calendar keys of its date """
+        return tuple(record.get(c) for c in self.COLUMNS) + (record.get("time"),) + calendar_keys(day_number(record["date"]))
+
+    def _record(self, row):
+        record = dict(zip(self.COLUMNS, row))
+        if row[6] is not None:
+            record["time"] = row[6]
+        return record
+
+    def _position(self, conn):
+        """ (largest row id, row count) """
+        return tuple(conn.execute("SELECT coalesce(max(id), 0), count(*) FROM foods").fetchone())
+
+    def _date_filter(self, start, end):
+        clauses, args = [], []
+        if start is not None:
+            clauses.append("day >= ?")
+            args.append(day_number(start))
+        if end is not None:
+            clauses.append("day <= ?")
+            args.append(day_number(end))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+
+class WriteBehind:
+    """ Buffers new records and writes them to a store in batches.
+
+    Every ``append`` restarts a short debounce timer; when it fires, or once
+    the oldest buffered record has waited ``max_delay`` seconds, the whole
+    buffer goes to the store with one ``append_many`` (one write and one
+    fsync). ``flush`` writes at once and ``close``, also run at interpreter
+    exit, writes whatever is left. ``on_flush(records)`` is called after
+    each successful write. A failed timed write keeps its records buffered
+    for the next flush and is passed to ``on_error(error)``.
+    """
+
+    def __init__(self, store, delay=FLUSH_DELAY, max_delay=MAX_FLUSH_DELAY, on_flush=None, on_error=None):
+        self.store = store
+        self.delay = delay
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self._pending = []
+        self._oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def append(self, record):
+        with self._lock:
+            self._pending.append(record)
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            if self._timer is not None:
+                self._timer.cancel()
+            delay = max(0.0, min(self.delay, self._oldest + self.max_delay - now))
+            self._timer = threading.Timer(delay, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """ Write every buffered record now and return how many; raises if the write fails """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch, self._pending, self._oldest = self._pending, [], None
+            if not batch:
+                return 0
+            try:
+                with span("storage.append"):
+                    self.store.append_many(batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._oldest = time.monotonic()
+                raise
+            if self.on_flush is not None:
+                self.on_flush(batch)
+            return len(batch)
+
+    def close(self):
+        atexit.unregister(self.close)
+        self.flush()
+
+    def _timed_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+
+
+_stores = {}
+
+
+def open_store(path):
+    """ Open a new, uncached store for path, picking the backend from its extension """
+    if path.endswith(SQLITE_EXTENSIONS):
+        return SqliteStore(path)
+    if path.endswith(BINARY_EXTENSIONS):
+        from binlog import BinaryStore
+
+        return BinaryStore(path)
+    return JournalStore(path)
+
+
+def get_store(path=DATA_FILE):
+    """ Return the shared store for path """
+    if path not in _stores:
+        _stores[path] = open_store(path)
+    return _stores[path]
+
+
+def load_data(path=DATA_FILE):
+    return get_store(path).load()
+
+
+def save_data(data, path=DATA_FILE):
+    get_store(path).save(data)
+
+
+def iter_records(start=None, end=None, path=DATA_FILE):
+    """ Stream the stored records dated between start and end in date order """
+    return get_store(path).query(start, end)
+
+
+def append_food(record, path=DATA_FILE):
+    get_store(path).append(record)
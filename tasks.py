@@ -0,0 +1,125 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """ Raised inside a task by check_cancelled() once a newer task has replaced it """
+
+
+class Task:
+    """ Handle passed to a running job for cooperative cancellation and progress reports """
+
+    def __init__(self, scheduler, key, on_progress):
+        self._scheduler = scheduler
+        self._cancelled = threading.Event()
+        self.key = key
+        self.on_progress = on_progress
+        self.future = None
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise TaskCancelled()
+
+    def progress(self, value):
+        """ Report progress from the worker; on_progress runs on the Tk thread """
+        if self.on_progress is not None and not self.cancelled():
+            self._scheduler.post(self.on_progress, value)
+
+
+class TaskScheduler:
+    """ Runs slow work off the Tk thread and hands results back to it.
+
+    Jobs run on a thread pool, or on a single "serial" worker when they must
+    not overlap (writes to the data and rollup files). Every job is called as
+    ``fn(task, *args)``. Callbacks (on_done, on_error, on_progress) are queued
+    and run on the Tk thread by a ``root.after`` poll, so they can touch
+    widgets freely. Submitting a job with the same ``key`` as a running one
+    cancels the older job and drops its result.
+    """
+
+    def __init__(self, root, max_workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tracker")
+        self._serial = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracker-io")
+        self._callbacks = queue.Queue()
+        self._latest = {}
+        self._closed = False
+        self.root.after(self.poll_ms, self._drain)
+
+    def submit(self, fn, *args, key=None, serial=False, on_done=None, on_error=None, on_progress=None):
+        if key is not None and key in self._latest:
+            self._latest[key].cancel()
+        task = Task(self, key, on_progress)
+        if key is not None:
+            self._latest[key] = task
+        executor = self._serial if serial else self._pool
+        task.future = executor.submit(self._run, task, fn, args, on_done, on_error)
+        return task
+
+    def _run(self, task, fn, args, on_done, on_error):
+        try:
+            task.check_cancelled()
+            result = fn(task, *args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            if not task.cancelled():
+                self.post(self._finish, task, on_error, e)
+            return
+        if not task.cancelled():
+            self.post(self._finish, task, on_done, result)
+
+    def _finish(self, task, callback, value):
+        if task.key is not None and self._latest.get(task.key) is task:
+            del self._latest[task.key]
+        if task.cancelled():
+            return
+        if callback is not None:
+            callback(value)
+
+    def post(self, callback, *args):
+        """ Run callback(*args) on the Tk thread; safe to call from any thread """
+        self._callbacks.put((callback, args))
+
+    def _drain(self):
+        try:
+            while True:
+                try:
+                    callback, args = self._callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except Exception as e:
+                    # Reported like any Tk callback error; the rest of the queue still runs
+                    self.root.report_callback_exception(type(e), e, e.__traceback__)
+        finally:
+            if not self._closed:
+                self.root.after(self.poll_ms, self._drain)
+
+    def cancel(self, key):
+        """ Cancel the running job with this key, if any """
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def busy(self, key):
+        return key in self._latest
+
+    def shutdown(self):
+        """ Cancel keyed jobs and wait for queued writes to finish """
+        self._closed = True
+        for task in self._latest.values():
+            task.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._serial.shutdown(wait=True)
@@ -1,67 +1,93 @@
-from dataclasses import dataclass
-import json
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from storage import CorruptDataError, append_food
+from report import write_report
+from foodlog import aggregate, load_log
+from lod import reduce_summary
+from catalog import FoodCatalog
+from records import Food, day_string, today
+from goals import GOALS, load_goals
+
+# Load saved data; a damaged file is reported and left alone rather than replaced by an empty history
+try:
+    data = load_log()
+except CorruptDataError as e:
+    sys.exit(f"{e}\nYour food history was left untouched. Restore it from a backup, or move it aside to start over.")
 
-# Load saved data
-DATA_FILE = "data.json"
-
-def load_data():
-    try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+# User input for daily goals
+def ask_goals():
+    """ Prompt until the user confirms their goals; returns them as a dict """
+    while True:
+        try:
+            CALORIE_LIMIT = int(input("Enter your daily calorie limit (kcal): "))
+            PROTEIN_GOAL = int(input("Enter your daily protein goal (grams): "))
+            FAT_GOAL = int(input("Enter your daily fat goal (grams): "))
+            CARBS_GOAL = int(input("Enter your daily carbs goal (grams): "))
+        except ValueError:
+            print("\nInvalid input. Please enter numeric values.\n")
+            continue
 
-data = load_data()
+        print("Your goals are set as follows:")
+        print(f"Calorie Limit: {CALORIE_LIMIT} kcal")
+        print(f"Protein Goal: {PROTEIN_GOAL} grams")
+        print(f"Fat Goal: {FAT_GOAL} grams")
+        print(f"Carbs Goal: {CARBS_GOAL} grams")
 
-# User input for daily goals
-while True:
-    try:
-        CALORIE_LIMIT = int(input("Enter your daily calorie limit (kcal): "))
-        PROTEIN_GOAL = int(input("Enter your daily protein goal (grams): "))
-        FAT_GOAL = int(input("Enter your daily fat goal (grams): "))
-        CARBS_GOAL = int(input("Enter your daily carbs goal (grams): "))
-    except ValueError:
-        print("\nInvalid input. Please enter numeric values.\n")
-        continue
-
-    print("Your goals are set as follows:")
-    print(f"Calorie Limit: {CALORIE_LIMIT} kcal")
-    print(f"Protein Goal: {PROTEIN_GOAL} grams")
-    print(f"Fat Goal: {FAT_GOAL} grams")
-    print(f"Carbs Goal: {CARBS_GOAL} grams")
-
-    confirmation = input("\nDo you confirm these goals? (yes/no): ").strip().lower()
-    if confirmation == "yes":
-        print("\nGoals confirmed!")
-        break
-    else:
-        print("\nPlease re-enter your goals\n")
+        confirmation = input("\nDo you confirm these goals? (yes/no): ").strip().lower()
+        if confirmation == "yes":
+            print("\nGoals confirmed!")
+            return {"calories": CALORIE_LIMIT, "protein": PROTEIN_GOAL, "fat": FAT_GOAL, "carbs": CARBS_GOAL}
+        else:
+            print("\nPlease re-enter your goals\n")
+
+# Saved goals are reused; only the first run (or "Change goals") prompts
+goals_profile = load_goals()
+goals = goals_profile.current()
+if goals:
+    print(f"Goals: {goals['calories']} kcal, {goals['protein']} g protein, {goals['fat']} g fat, {goals['carbs']} g carbs")
+else:
+    goals = ask_goals()
+    goals_profile.set(goals)
+CALORIE_LIMIT, PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL = (goals[goal] for goal in GOALS)
 
 done = False
 
-@dataclass
-class Food:
-    name: str
-    calories: int
-    protein: int
-    fat: int
-    carbs: int
-    date: str
+# Foods logged before (plus foods.csv, if present) for name suggestions
+catalog = FoodCatalog.from_log(data)
+if os.path.exists("foods.csv"):
+    catalog.import_csv("foods.csv")
+
+def pick_catalog_food(name):
+    """ Return the catalog entry for name, or one the user picks from close matches """
+    known = catalog.get(name)
+    if known is not None:
+        return known
+    matches = catalog.suggest(name, limit=5)
+    if not matches:
+        return None
+    print("Did you mean:")
+    for i, food in enumerate(matches, 1):
+        print(f"  ({i}) {food['name']} - {food['calories']} kcal")
+    pick = input("Pick a number, or press Enter to keep your name: ").strip()
+    if pick.isdigit() and 1 <= int(pick) <= len(matches):
+        return matches[int(pick) - 1]
+    return None
+
+def ask_int(label, default=None):
+    """ Prompt for a whole number; an empty answer takes the default when there is one """
+    if default is None:
+        return int(input(f"{label}: "))
+    answer = input(f"{label} [{round(default)}]: ").strip()
+    return int(answer) if answer else round(default)
 
 while not done:
     print("""
     (1) Add a new food
     (2) Visualize Data
     (3) Export Data to PDF
+    (g) Change goals
     (q) Quit
     """)
     
@@ -71,14 +97,18 @@ while not done:
         print("Adding a new food!")
         try:
             name = input("Name: ")
-            calories = int(input("Calories: "))
-            protein = int(input("Proteins: "))
-            fats = int(input("Fats: "))
-            carbs = int(input("Carbs: "))
-            date = datetime.today().strftime('%Y-%m-%d')
-            food = Food(name, calories, protein, fats, carbs, date)
-            data.append(food.__dict__)
-            save_data(data)
+            known = pick_catalog_food(name)
+            if known is not None:
+                name = known["name"]
+            calories = ask_int("Calories", known and known["calories"])
+            protein = ask_int("Proteins", known and known["protein"])
+            fats = ask_int("Fats", known and known["fat"])
+            carbs = ask_int("Carbs", known and known["carbs"])
+            food = Food.create(name, calories, protein, fats, carbs)
+            data.append(food)
+            record = food.to_dict()
+            append_food(record)
+            catalog.add(record)
             print("Successfully added!")
         except ValueError:
             print("\nInvalid input. Please enter numeric values.\n")
@@ -93,40 +123,39 @@ while not done:
         graph_choice = input("Choose an option: ")
 
         if graph_choice == "1":
-            start_date = datetime.today().strftime('%Y-%m-%d')
+            start_date = day_string(today())
         elif graph_choice == "2":
-            start_date = (datetime.today() - timedelta(days=7)).strftime('%Y-%m-%d')
+            start_date = day_string(today() - 7)
         elif graph_choice == "3":
-            start_date = (datetime.today() - timedelta(days=30)).strftime('%Y-%m-%d')
+            start_date = day_string(today() - 30)
         elif graph_choice == "4":
             start_date = input("Enter start date (YYYY-MM-DD): ")
         else:
             print("Invalid choice, defaulting to daily.")
-            start_date = datetime.today().strftime('%Y-%m-%d')
+            start_date = day_string(today())
 
-        filtered_data = [f for f in data if f.get('date', '') >= start_date]
-
-        # Helper function to ensure valid numbers
-        def get_valid_number(value):
-            try:
-                return float(value) if value not in [None, "", "NaN"] else 0
-            except ValueError:
-                return 0
+        try:
+            filtered_data = data.slice_by_date(start_date)
+        except ValueError:
+            print("\nInvalid date. Please use the format YYYY-MM-DD.\n")
+            continue
 
-        protein_sum = sum(get_valid_number(f.get("protein", 0)) for f in filtered_data)
-        fat_sum = sum(get_valid_number(f.get("fat", 0)) for f in filtered_data)
-        carb_sum = sum(get_valid_number(f.get("carbs", 0)) for f in filtered_data)
+        # Macro values are coerced to valid numbers when loaded into the FoodLog
+        summary = aggregate(filtered_data)
+        totals = summary["totals"]
+        protein_sum = totals["protein"]
+        fat_sum = totals["fat"]
+        carb_sum = totals["carbs"]
 
         if protein_sum == 0 and fat_sum == 0 and carb_sum == 0:
             print("No valid macronutrient data to display.")
             continue
 
-        datewise_calories = {}
-        for food in filtered_data:
-            datewise_calories[food['date']] = datewise_calories.get(food['date'], 0) + get_valid_number(food.get('calories', 0))
-
-        dates = list(datewise_calories.keys())
-        calories = list(datewise_calories.values())
+        # One bar per day gets unreadable over long ranges; bucket to fit half the figure width
+        width_px = plt.rcParams["figure.figsize"][0] * plt.rcParams["figure.dpi"] / 2
+        series = reduce_summary(summary, width_px)
+        dates = [str(d) for d in series["dates"]]
+        calories = series["mean"]["calories"]
 
         fig, axs = plt.subplots(2, 2)
         axs[0, 0].pie(
@@ -150,11 +179,11 @@ while not done:
         axs[0, 1].bar([0.5, 1.5, 2.5], [PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL], width=0.4, color='orange', label="Goal")
         axs[0, 1].set_title("Macronutrient Progress")
 
-        axs[1, 0].pie([sum(f['calories'] for f in filtered_data), CALORIE_LIMIT - sum(f['calories'] for f in filtered_data)], labels=["Calories", "Remaining"], autopct="%1.1f%%")
+        axs[1, 0].pie([totals["calories"], CALORIE_LIMIT - totals["calories"]], labels=["Calories", "Remaining"], autopct="%1.1f%%")
         axs[1, 0].set_title("Calorie Goal Progress")
 
         axs[1, 1].bar(dates, calories, color='green')
-        axs[1, 1].set_title("Calorie Intake Over Time")
+        axs[1, 1].set_title("Calorie Intake Over Time" if series["level"] == "Daily" else f"Calorie Intake Over Time ({series['level']} avg)")
         axs[1, 1].set_xticklabels(dates, rotation=45, ha='right')
 
         fig.tight_layout()
@@ -162,17 +191,13 @@ while not done:
 
     elif choice == "3":
         pdf_filename = "calorie_report.pdf"
-        c = canvas.Canvas(pdf_filename, pagesize=letter)
-        c.drawString(100, 750, "Calorie Tracker Report")
-        y = 720
-        for food in data:
-            c.drawString(100, y, f"{food['date']} - {food['name']}: {food['calories']} kcal")
-            y -= 20
-            if y < 50:
-                c.showPage()
-                y = 750
-        c.save()
-        print(f"Data successfully exported to {pdf_filename}")
+        rows = write_report(data, pdf_filename)
+        print(f"{rows} records successfully exported to {pdf_filename}")
+
+    elif choice == "g":
+        goals = ask_goals()
+        goals_profile.set(goals)
+        CALORIE_LIMIT, PROTEIN_GOAL, FAT_GOAL, CARBS_GOAL = (goals[goal] for goal in GOALS)
 
     elif choice == "q":
         done = True
@@ -0,0 +1,50 @@
+""" Regression tests for the binary food log.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binlog import HEADER, MAGIC, ROW, SCALE, VERSION, BinaryStore  # noqa: E402
+
+
+def food(name, calories, day="2024-01-01"):
+    return {"name": name, "calories": calories, "protein": 1.5, "fat": 0, "carbs": 0, "date": day}
+
+
+def test_empty_file_opens_and_appends(tmp_path):
+    # A new user's file, or one a crash left empty
+    path = str(tmp_path / "data.ctlog")
+    open(path, "wb").close()
+    store = BinaryStore(path)
+    assert store.load() == []
+    assert len(store.log()) == 0
+    store.append(food("apple", 95))
+    assert BinaryStore(path).load() == [food("apple", 95)]
+
+
+def test_version_1_file_is_read_and_upgraded(tmp_path):
+    path = str(tmp_path / "data.ctlog")
+    rows = np.zeros(2, dtype=ROW)
+    rows["day"] = 19723
+    rows["name"] = [0, 1]
+    rows["calories"] = [100, 250]
+    rows["protein"] = 1.5 * SCALE
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, ROW.itemsize, SCALE, len(rows)))
+        f.write(rows.tobytes())
+    with open(path + ".names", "w") as f:
+        f.write('"apple"\n"pear"\n')
+
+    # Version 1 stored whole kcal
+    store = BinaryStore(path)
+    assert store.load() == [food("apple", 100), food("pear", 250)]
+
+    store.append(food("toast", 250.7))
+    with open(path, "rb") as f:
+        assert HEADER.unpack(f.read(HEADER.size))[1] == VERSION
+    assert BinaryStore(path).load() == [food("apple", 100), food("pear", 250), food("toast", 250.7)]
@@ -0,0 +1,46 @@
+""" Regression tests for the what-if planner.
+
+Usage: python -m pytest tests
+"""
+import os
+import random
+import sys
+from itertools import combinations_with_replacement
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MACROS, TOLERANCE  # noqa: E402
+from planner import Planner, _weights  # noqa: E402
+
+GOALS = {"calories": 2000, "protein": 120, "fat": 70, "carbs": 250}
+EATEN = {"calories": 900, "protein": 40, "fat": 30, "carbs": 110}
+
+
+def brute_force_score(foods, max_items=3):
+    over, under = _weights()
+    cap = GOALS["calories"] - EATEN["calories"] + TOLERANCE * GOALS["calories"]
+    best = None
+    for size in range(1, max_items + 1):
+        for combo in combinations_with_replacement(foods, size):
+            totals = [sum(food[macro] for food in combo) for macro in MACROS]
+            if totals[0] > cap:
+                continue
+            score = 0.0
+            for m, macro in enumerate(MACROS):
+                deviation = (totals[m] - max(GOALS[macro] - EATEN[macro], 0)) / max(GOALS[macro], 1)
+                score += (over[m] if deviation > 0 else under[m]) * deviation * deviation
+            best = score if best is None else min(best, score)
+    return best
+
+
+def test_small_catalog_finds_the_best_plan():
+    rng = random.Random(7)
+    for _ in range(20):
+        foods = [
+            {"name": f"food {i}", "calories": rng.uniform(50, 900), "protein": rng.uniform(0, 60),
+             "fat": rng.uniform(0, 40), "carbs": rng.uniform(0, 120)}
+            for i in range(20)
+        ]
+        plans = Planner(foods).plan(EATEN, GOALS)
+        assert plans
+        assert abs(plans[0]["score"] - brute_force_score(foods)) < 1e-9
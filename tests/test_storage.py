@@ -0,0 +1,43 @@
+""" Regression tests for the JSON journal store.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JournalStore  # noqa: E402
+
+FOOD = {"name": "apple", "calories": 95, "protein": 0.5, "fat": 0.3, "carbs": 25, "date": "2024-01-01"}
+
+
+def test_load_never_goes_back_while_compacting(tmp_path):
+    # A second store on the same file stands in for another process loading while this one compacts
+    path = str(tmp_path / "data.json")
+    writer = JournalStore(path, compact_threshold=50)
+    reader = JournalStore(path)
+    done = threading.Event()
+    regressions = []
+
+    def load():
+        last = 0
+        while not done.is_set():
+            count = len(reader.load())
+            if count < last:
+                regressions.append((last, count))
+            last = max(last, count)
+
+    loader = threading.Thread(target=load)
+    loader.start()
+    try:
+        for _ in range(1500):
+            writer.append(FOOD)
+        writer.wait()
+    finally:
+        done.set()
+        loader.join()
+
+    assert regressions == []
+    assert len(reader.load()) == 1500
@@ -1,15 +1,18 @@
 import tkinter as tk
 from tkinter import messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime
+from foodlog import FoodLog, aggregate
+from dashboard import Dashboard
 
 class CalorieTracker:
     def __init__(self, root):
         self.root = root
         self.root.title("Calorie Tracker")
         self.root.geometry("500x500")
-        self.data = []
+        self.data = FoodLog()
+        self.graph_window = None
+        self.dashboard = None
+        self.graph_range = None
 
         tk.Label(root, text="Food Name:").pack()
         self.food_entry = tk.Entry(root)
@@ -49,7 +52,7 @@ class CalorieTracker:
             datetime.strptime(date, "%Y-%m-%d")  # Ensure valid date format
 
             self.data.append({
-                "food": food,
+                "name": food,
                 "calories": calories,
                 "protein": protein,
                 "fat": fat,
@@ -57,6 +60,10 @@ class CalorieTracker:
                 "date": date
             })
 
+            # Keep an open dashboard current with the new entry
+            if self.dashboard is not None:
+                self.update_graphs()
+
             messagebox.showinfo("Success", "Food entry added!")
         except ValueError:
             messagebox.showerror("Error", "Invalid input. Ensure all fields are filled correctly.")
@@ -66,9 +73,14 @@ class CalorieTracker:
             messagebox.showerror("No Data", "No food data to visualize.")
             return
 
+        if self.graph_window is not None:
+            self.graph_window.lift()
+            return
+
         self.graph_window = tk.Toplevel(self.root)
         self.graph_window.title("Data Visualization")
         self.graph_window.geometry("800x600")
+        self.graph_window.protocol("WM_DELETE_WINDOW", self.close_graph_window)
 
         tk.Label(self.graph_window, text="Enter start date (YYYY-MM-DD):").pack()
         self.start_date_entry = tk.Entry(self.graph_window)
@@ -85,52 +97,36 @@ class CalorieTracker:
         end_date = self.end_date_entry.get()
 
         try:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
         except ValueError:
             messagebox.showerror("Invalid Date", "Please enter valid dates in the format YYYY-MM-DD.")
             return
 
-        filtered_data = [f for f in self.data if start_date <= datetime.strptime(f['date'], "%Y-%m-%d") <= end_date]
+        self.graph_range = (start_date, end_date)
+        self.update_graphs()
+
+    def update_graphs(self):
+        filtered_data = self.data.slice_by_date(*self.graph_range)
 
         if not filtered_data:
             messagebox.showerror("No Data", "No food data available for the selected period.")
             return
 
-        fig, axs = plt.subplots(2, 2, figsize=(10, 8))
-
-        datewise_calories = {}
-        for food in filtered_data:
-            datewise_calories[food['date']] = datewise_calories.get(food['date'], 0) + food['calories']
-        axs[0, 0].bar(datewise_calories.keys(), datewise_calories.values())
-        axs[0, 0].set_title('Total Calories')
-        axs[0, 0].tick_params(axis='x', rotation=45)
-
-        total_protein = sum(f['protein'] for f in filtered_data)
-        total_fat = sum(f['fat'] for f in filtered_data)
-        total_carbs = sum(f['carbs'] for f in filtered_data)
-        axs[0, 1].pie([total_protein, total_fat, total_carbs], labels=["Protein", "Fat", "Carbs"], autopct='%1.1f%%')
-        axs[0, 1].set_title('Macronutrient Distribution')
-
-        datewise_protein = {}
-        for food in filtered_data:
-            datewise_protein[food['date']] = datewise_protein.get(food['date'], 0) + food['protein']
-        axs[1, 0].bar(datewise_protein.keys(), datewise_protein.values())
-        axs[1, 0].set_title('Protein Intake')
-        axs[1, 0].tick_params(axis='x', rotation=45)
-
-        datewise_fat = {}
-        for food in filtered_data:
-            datewise_fat[food['date']] = datewise_fat.get(food['date'], 0) + food['fat']
-        axs[1, 1].bar(datewise_fat.keys(), datewise_fat.values())
-        axs[1, 1].set_title('Fat Intake')
-        axs[1, 1].tick_params(axis='x', rotation=45)
-
-        fig.tight_layout()
-
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_window)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # One dashboard per window, updated in place on every "Generate Graphs"
+        if self.dashboard is None:
+            self.dashboard = Dashboard(self.graph_window, figsize=(10, 8), rotate_dates=True)
+            self.dashboard.widget().pack(fill=tk.BOTH, expand=True)
+
+        self.dashboard.update(aggregate(filtered_data))
+
+    def close_graph_window(self):
+        if self.dashboard is not None:
+            self.dashboard.destroy()
+        self.graph_window.destroy()
+        self.graph_window = None
+        self.dashboard = None
+        self.graph_range = None
 
 if __name__ == "__main__":
     root = tk.Tk()